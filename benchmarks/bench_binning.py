@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# benchmark: building the plot bins and statistics windows from the history,
+# message by message vs. vectorized with numpy
+#
+#   python benchmarks/bench_binning.py [--number N]
+#
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ft8mapper import history
+from ft8mapper import timebins
+from ft8mapper import windowstats
+from ft8mapper import constants
+
+# messages evenly spread over the raw history, like a busy station on several bands
+def synthetic_history(number, now):
+    random.seed(1)
+    bands = [band for _, _, band, _ in constants.band_list]
+    grids = ['%s%s%d%d' % (a, b, c, d) for a in 'ABCDEFGHIJKLMNOPQR' for b in 'ABCDEFGHIJKLMNOPQR' for c in range(10) for d in range(0, 10, 3)]
+    calls = ['%s%d%s' % (random.choice(['DL', 'K', 'W', 'JA', 'VK', 'PY']), random.randrange(10), ''.join(random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(3))) for _ in range(20000)]
+    locations = {call: random.choice(grids) for call in calls}
+    data = history.MessageHistory()
+    step = constants.MAX_MESSAGE_AGE / number
+    for i in range(number):
+        call = random.choice(calls)
+        data.append(now - constants.MAX_MESSAGE_AGE + i * step, call, locations[call], random.choice(bands), random.randrange(-26, 20))
+    return data
+
+def run(build):
+    start = time.perf_counter()
+    build()
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=1000000, help='Number of synthetic messages.')
+    args = parser.parse_args()
+    if timebins.numpy is None:
+        print('numpy is not installed, only the plain Python path is available')
+
+    now = time.time()
+    start = time.perf_counter()
+    data = synthetic_history(args.number, now)
+    print('created %d messages in %.1f s' % (len(data), time.perf_counter() - start))
+
+    for span, (resolution, *_) in sorted(constants.plot_resolutions.items()):
+        exact = span <= constants.DISTINCT_EXACT_SPAN
+        times = []
+        for vectorized in (False, True):
+            if vectorized and timebins.numpy is None:
+                break
+            tier = timebins.TimeBins(resolution, span, exact)
+            times.append(run(lambda: tier.add_history(data, now - span, vectorized)))
+        window = windowstats.WindowStats(span, constants.any_band, 'JO62')
+        python_window = run(lambda: window.build(data, now, False))
+        numpy_window = None
+        if timebins.numpy is not None:
+            window = windowstats.WindowStats(span, constants.any_band, 'JO62')
+            numpy_window = run(lambda: window.build(data, now, True))
+        print('%8d s bins of %6d s: python %7.3f s  numpy %s   window: python %7.3f s  numpy %s' % (
+            span,
+            resolution,
+            times[0],
+            ('%7.3f s  speedup x%5.1f' % (times[1], times[0] / times[1])) if len(times) > 1 else '-',
+            python_window,
+            ('%7.3f s  speedup x%5.1f' % (numpy_window, python_window / numpy_window)) if numpy_window is not None else '-'
+            ))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# microbenchmark: struct based decoder vs. the former int.from_bytes parser
+#
+#   python benchmarks/bench_decoder.py [--number N]
+#
+import os
+import sys
+import struct
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ft8mapper import decoder
+
+def qstring(s):
+    b = s.encode('utf-8')
+    return struct.pack('>I', len(b)) + b
+
+def packet(pkttype, payload, id='WSJT-X'):
+    return struct.pack('>III', decoder.MAGIC, 2, pkttype) + qstring(id) + payload
+
+def status_packet():
+    payload = struct.pack('>Q', 14074000)
+    payload += qstring('FT8') + qstring('') + qstring('') + qstring('FT8')
+    payload += struct.pack('>???II', False, False, True, 1500, 1500)
+    payload += qstring('DL1ABC') + qstring('JO62QM') + qstring('')
+    payload += struct.pack('>?', False) + qstring('') + struct.pack('>?BII', False, 0, 0, 15)
+    payload += qstring('Default') + qstring('')
+    return packet(decoder.STATUS, payload)
+
+def decode_packet(message):
+    payload = struct.pack('>?IidI', True, 12 * 3600 * 1000 + 15000, -12, 0.2, 1234)
+    payload += qstring('~') + qstring(message) + struct.pack('>??', False, False)
+    return packet(decoder.DECODE, payload)
+
+# the parser that was used by networking.py before decoder.py existed
+def legacy_parse(data):
+    pkttype = int.from_bytes(data[8 : 12], 'big')
+    idlen = int.from_bytes(data[12 : 16], 'big')
+    offset = 16
+    swid = data[offset : offset + idlen]
+    offset += idlen
+    data = data[offset:]
+    offset = 0
+    if pkttype == 1:
+        nfreq = int.from_bytes(data[offset : offset + 8], 'big')
+        offset += 8
+        for i in range(4):
+            size = int.from_bytes(data[offset : offset + 4], 'big')
+            offset += 4 + (size if size != 0xFFFFFFFF else 0)
+        offset += 3
+        offset += 8
+        size = int.from_bytes(data[offset : offset + 4], 'big')
+        offset += 4
+        de_call = data[offset : offset + size].decode('utf-8') if size > 0 else '-'
+        offset += (size if size != 0xFFFFFFFF else 0)
+        size = int.from_bytes(data[offset : offset + 4], 'big')
+        offset += 4
+        de_grid = data[offset : offset + size].decode('utf-8')[:4] if size > 0 else ''
+        return swid, nfreq, de_call, de_grid
+    elif pkttype == 2:
+        new = bool.from_bytes(data[offset : offset + 1], 'big')
+        offset += 1
+        tmi = int.from_bytes(data[offset : offset + 4], 'big') / 1000
+        offset += 4
+        snr = int.from_bytes(data[offset : offset + 4], 'big', signed=True)
+        offset += 4
+        deltat = data[offset : offset + 8]
+        offset += 8
+        deltaf = data[offset : offset + 4]
+        offset += 4
+        modelenval = int.from_bytes(data[offset : offset + 4], 'big')
+        offset += 4
+        mode = data[offset : offset + modelenval]
+        offset += modelenval
+        mesglenval = int.from_bytes(data[offset : offset + 4], 'big')
+        offset += 4
+        mesg = data[offset : offset + mesglenval].decode('utf-8')
+        return swid, new, tmi, snr, mode, mesg
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200000, help='Number of packets decoded per run.')
+    args = parser.parse_args()
+
+    packets = {
+        'status': status_packet(),
+        'decode': decode_packet('CQ DL1ABC JO62'),
+    }
+    for name, data in packets.items():
+        legacy = min(timeit.repeat(lambda: legacy_parse(data), number=args.number, repeat=3))
+        current = min(timeit.repeat(lambda: decoder.decode(data), number=args.number, repeat=3))
+        print('%-8s legacy %6.3f us/pkt   decoder %6.3f us/pkt   speedup x%.2f' % (
+            name,
+            1.0e6 * legacy / args.number,
+            1.0e6 * current / args.number,
+            legacy / current
+            ))
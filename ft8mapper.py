@@ -28,6 +28,10 @@ if __name__ == '__main__':
         parser.add_argument('--verbose', default=False, action='store_true', help='Include DEBUG messages in console output.')
         parser.add_argument('--example-stations', default=False, action='store_true', help='Add world cities as example stations. No messages will be saved on exit.')
         parser.add_argument('--rx-grid', metavar='GRID', type=str, help='Overwrite maidenhead locator of receiving station.')
+        parser.add_argument('--headless', default=False, action='store_true', help='Collect and save messages without user interface, e.g. on a server without display.')
+        parser.add_argument('--record', metavar='FILE', type=str, help='Write all datagrams received from WSJT-X to a capture file.')
+        parser.add_argument('--replay', metavar='FILE', type=str, help='Read datagrams from a capture file instead of listening to WSJT-X.')
+        parser.add_argument('--replay-speed', metavar='N', type=float, default=1.0, help='Replay N times faster than recorded, 0 replays as fast as possible. Default is real time.')
 
         try:
             args = parser.parse_args()
@@ -37,7 +41,21 @@ if __name__ == '__main__':
 
         logging.basicConfig(level=logging.INFO if not args.verbose else logging.DEBUG)
 
-        app = Application(example_stations=args.example_stations, rx_grid=args.rx_grid)
+        if args.headless and (args.example_stations or args.rx_grid is not None):
+            logging.warning('--example-stations and --rx-grid are ignored in headless mode')
+
+        if args.replay_speed < 0:
+            logging.error('--replay-speed must not be negative')
+            sys.exit(1)
+
+        app = Application(
+            example_stations=args.example_stations,
+            rx_grid=args.rx_grid,
+            headless=args.headless,
+            record=args.record,
+            replay=args.replay,
+            replay_speed=args.replay_speed
+            )
         app.run()
     except Exception as e:
         logging.error(e)
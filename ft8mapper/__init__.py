@@ -7,31 +7,73 @@ from functools import partial
 logger = logging.getLogger('app')
 
 class Application():
-    from . import gui
     from . import version
+    from . import constants
     from . import networking
+    from . import knowncalls
 
-    def __init__(self, example_stations=False, rx_grid=None):
+    # headless: collect data without user interface, tkinter and PIL are not imported
+    # record: write every received datagram to this capture file
+    # replay: read datagrams from this capture file instead of the network, replay_speed 0 is as fast as possible
+    def __init__(self, example_stations=False, rx_grid=None, headless=False, record=None, replay=None, replay_speed=1.0):
         # directory we are executing from, i.e. current working directory
         self.cwd = os.path.realpath(os.path.dirname(sys.argv[0]))
 
         self.load_config()
 
-        self.gui = self.gui.GUI(
-            self.config,
-            on_config_changed=partial(self.save_config, self),
-            on_exit=partial(self.exit, self),
-            example_stations=example_stations,
-            rx_grid=rx_grid
-            )
-        
-        self.network = self.networking.Networking(
-            self.config['network']['host'],
-            self.config['network']['port'],
-            on_message=partial(self.gui.on_message, self.gui),
-            on_band_changed=partial(self.gui.on_band_changed, self.gui),
-            on_receiver_location=partial(self.gui.on_receiver_location, self.gui)
-            )
+        if headless:
+            from . import headless
+            self.gui = headless.Headless(
+                self.config,
+                on_exit=partial(self.exit, self)
+                )
+        else:
+            from . import gui
+            self.gui = gui.GUI(
+                self.config,
+                on_config_changed=partial(self.save_config, self),
+                on_exit=partial(self.exit, self),
+                example_stations=example_stations,
+                rx_grid=rx_grid
+                )
+
+        self.recorder = None
+        if record is not None:
+            from . import capture
+            self.recorder = capture.Recorder(record)
+
+        self.known_calls = self.knowncalls.KnownCalls(os.path.join(self.config['configdir'], 'knowncalls.json'))
+        self.known_calls.load()
+
+        callbacks = {
+            'on_message': partial(self.gui.on_message, self.gui),
+            'on_decodes': partial(self.gui.on_decodes, self.gui),
+            'on_band_changed': partial(self.gui.on_band_changed, self.gui),
+            'on_receiver_location': partial(self.gui.on_receiver_location, self.gui),
+            'recorder': self.recorder,
+            'known_calls': self.known_calls
+            }
+        if replay is not None:
+            self.network = self.networking.ReplayNetworking(
+                replay,
+                speed=replay_speed,
+                on_finished=self.gui.stop if headless else None, # keep the window open to inspect the result
+                **callbacks
+                )
+        else:
+            engine = {
+                'thread': self.networking.Networking,
+                'asyncio': self.networking.AsyncNetworking
+                }[self.config['network'].get('engine', 'thread')]
+            self.network = engine(
+                self.config['network']['host'],
+                self.config['network']['port'],
+                multicast=self.config['network'].get('multicast', ''),
+                interface=self.config['network'].get('interface', ''),
+                reuse=self.config['network'].get('reuse', False),
+                endpoints=self.config['network'].get('endpoints', []),
+                **callbacks
+                )
 
         logger.info('%s is initialized' % self.version.APPNAME)
 
@@ -47,7 +89,10 @@ class Application():
             logger.error(e)
         finally:
             logger.info('%s is exiting' % self.version.APPNAME)
-            self.network.stop()
+            self.exit(self)
+            if self.recorder is not None:
+                self.recorder.close()
+            self.known_calls.save()
 
     def default_config(self):
         self.config = {}
@@ -55,10 +100,57 @@ class Application():
         self.config['network'] = {}
         self.config['network']['host'] = '127.0.0.1'
         self.config['network']['port'] = 2237
+        self.config['network']['engine'] = 'thread' # 'thread' or 'asyncio'
+        self.config['network']['multicast'] = '' # multicast group to join instead of unicast, e.g. 239.255.0.1
+        self.config['network']['interface'] = '' # ip address of interface for multicast, empty for any
+        self.config['network']['reuse'] = False # share the port with other applications
+        self.config['network']['endpoints'] = [] # additional endpoints, e.g. {"host": "127.0.0.1", "port": 2238, "multicast": "", "interface": "", "reuse": false}
         self.config['window'] = {}
         self.config['map'] = {}
 
-        self.gui.GUI.default_config(self.config)
+        # user interface
+        self.config['window']['dark'] = 0 # use light mode as default
+        self.config['window']['position'] = '1288x900+30+30'
+        self.config['window']['sort'] = 'C' # sort by call
+        self.config['window']['scale'] = 0 # use small map
+        self.config['window']['rangerings'] = 0 # no range rings
+        self.config['window']['curmap'] = 'WM' # show world map
+        self.config['window']['band'] = self.constants.any_band
+        self.config['window']['agelimit'] = 86400 # 1 day
+        self.config['window']['plot'] = {}
+        self.config['window']['plot']['x'] = 1800 # 30 minutes
+        self.config['window']['plot']['y'] = 'M' # plot messages per minute
+        self.config['window']['list'] = {} # visible table columns
+        self.config['window']['list']['grid'] = True
+        self.config['window']['list']['band'] = True
+        self.config['window']['list']['report'] = False
+        self.config['window']['list']['range'] = False
+        self.config['window']['list']['age'] = False
+        self.config['window']['list']['msgs'] = False
+        self.config['window']['list']['lastmsg'] = False
+        self.config['lookup'] = self.constants.lookup_QRZ
+        self.config['rx'] = '' # unknown receiver location
+        self.config['storage'] = 'json' # 'json', 'sqlite' or 'journal'
+
+        # initial slider positions for the maps
+        self.config['window']['map'] = {
+            # small map
+            'WM0': (0.128, 0.250),
+            'NA0': (0.250, 0.245),
+            'SA0': (0.200, 0.110),
+            'EU0': (0.110, 0.308),
+            'AF0': (0.185, 0.489),
+            'AS0': (0.324, 0.303),
+            'OC0': (0.230, 0.343),
+            # large map
+            'WM1': (0.128, 0.250),
+            'NA1': (0.250, 0.245),
+            'SA1': (0.200, 0.110),
+            'EU1': (0.110, 0.308),
+            'AF1': (0.185, 0.489),
+            'AS1': (0.324, 0.303),
+            'OC1': (0.230, 0.343)
+        }
 
     def load_config(self):
         logger.info('loading config file')
@@ -79,4 +171,5 @@ class Application():
 
     @staticmethod
     def exit(self):
+        self.gui.event_queue.close() # the network thread must not wait for the consumer while stopping
         self.network.stop()
\ No newline at end of file
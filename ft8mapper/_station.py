@@ -2,28 +2,36 @@ import json
 import time
 import datetime
 
+# time is kept as seconds since epoch, datetime is only created for display
 class Station():
-    def __init__(self, time, call, grid, band, report, message=''):
-        self.time = datetime.datetime.fromtimestamp(time)
+    __slots__ = ('time', 'call', 'grid', 'band', 'report', 'message', 'source')
+
+    def __init__(self, time, call, grid, band, report, message='', source=''):
+        self.time = float(time)
         self.call = call
         self.grid = grid
         self.band = int(band)
         self.report = int(report)
         self.message = message
+        self.source = source # id of the WSJT-X instance that decoded the message
 
     def utc(self):
-        return time.strftime('%H:%M:%SZ', time.gmtime(self.time.timestamp()))
+        return time.strftime('%H:%M:%SZ', time.gmtime(self.time))
+
+    def datetime(self):
+        return datetime.datetime.fromtimestamp(self.time)
     
 class Serializer(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, Station):
             return {
-                'time': o.time.timestamp(),
+                'time': o.time,
                 'call': o.call,
                 'grid': o.grid,
                 'band': o.band,
                 'report': o.report,
-                'message': o.message
+                'message': o.message,
+                'source': o.source
             }
         else:
             return super().default(o)
@@ -37,7 +45,8 @@ def from_json(o):
                 o['grid'],
                 o['band'],
                 o['report'],
-                o['message']
+                o['message'],
+                o.get('source', '')
             )
     except:
         pass
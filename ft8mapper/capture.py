@@ -0,0 +1,53 @@
+import struct
+import logging
+import threading
+
+logger = logging.getLogger('capture')
+
+# capture file format
+#   magic (8 bytes)
+#   records: receive time (float64, seconds since epoch), length (uint16), datagram
+# all values are little endian
+MAGIC = b'FT8MCAP\x01'
+_record = struct.Struct('<dH')
+
+# writes every datagram with its receive time
+class Recorder():
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lock = threading.Lock() # datagrams may arrive from multiple threads
+        self.count = 0
+        self.file = open(filepath, 'wb')
+        self.file.write(MAGIC)
+        logger.info('recording datagrams to %s' % filepath)
+
+    def write(self, data, t):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(_record.pack(t, len(data)))
+            self.file.write(data)
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                logger.info('recorded %d datagrams to %s' % (self.count, self.filepath))
+
+# generator of (receive time, datagram) read from a capture file
+def read(filepath):
+    with open(filepath, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise Exception('%s is not a capture file!' % filepath)
+        while True:
+            header = file.read(_record.size)
+            if len(header) < _record.size:
+                break # end of file
+            t, size = _record.unpack(header)
+            data = file.read(size)
+            if len(data) < size:
+                logger.warning('capture file %s is truncated' % filepath)
+                break
+            yield t, data
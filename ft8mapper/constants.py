@@ -45,9 +45,18 @@ plot_metrics = {
     'Report': 'R',
     'Range': 'D',
     'Stations': 'S',
-    'Grids': 'G'
+    'Grids': 'G',
+    'Report P10/50/90': 'P',
+    'Range P10/50/90': 'Q'
 }
 
+# quantiles of the percentile metrics
+plot_percentiles = (0.1, 0.5, 0.9)
+
+# reports in dB kept by quantiles.Histogram
+SNR_MIN = -30
+SNR_MAX = 30
+
 # convert text to seconds
 age_labels = {
     '7 days': 604800,
@@ -66,6 +75,9 @@ age_labels = {
 
 # age limit: [bar plot resolution, major tic resolution, label resolution, unit]
 plot_resolutions = {
+    31536000: [7 * 86400, 4 * 7 * 86400, 7 * 86400, 'w'],
+    7776000: [3 * 86400, 15 * 86400, 86400, 'd'],
+    2592000: [86400, 5 * 86400, 86400, 'd'],
     604800: [21600, 86400, 86400, 'd'],
     259200: [21600, 86400, 86400, 'd'],
     86400: [3600, 4 * 3600, 3600, 'h'],
@@ -82,6 +94,14 @@ plot_resolutions = {
 
 MAX_MESSAGE_AGE = max(age_labels.values())
 
+# time spans of the plot, beyond MAX_MESSAGE_AGE from hourly rollups
+plot_age_labels = {
+    '1 year': 31536000,
+    '90 days': 7776000,
+    '30 days': 2592000,
+}
+plot_age_labels.update(age_labels)
+
 # convert band label to band_name
 band_labels = {
     'All bands': any_band,
@@ -110,4 +130,23 @@ lookup_QRZ = 1
 lookup_HamCall = 2
 
 UPDATE_PERIOD = 250 # milliseconds between GUI updates
-CLEAN_PERIOD = 5 # minutes until data that is too old is removed
\ No newline at end of file
+CLEAN_PERIOD = 5 # minutes until data that is too old is removed
+SAVE_PERIOD = 15 # minutes between saving data in headless mode
+
+EVENT_QUEUE_SIZE = 50000 # maximum number of decoded messages waiting for the GUI
+EVENT_QUEUE_OVERFLOW = 'drop-oldest' # see events.EventQueue
+DECODE_BATCH_TIMEOUT = 1.0 # seconds after the last decode until an incomplete batch of decodes is delivered
+PARSE_CACHE_SIZE = 4096 # number of distinct messages whose classification is kept, see tokenizer.Tokenizer
+QSO_TIMEOUT = 300 # seconds a QSO partner is remembered to resolve hashed callsigns
+KNOWN_CALL_MAX_AGE = 30 # days until a callsign not heard again is forgotten
+GRID_CACHE_MAX_AGE = 30 # days until the grid of a callsign not heard again is forgotten
+HLL_PRECISION = 10 # 2 ** n registers per HyperLogLog sketch, i.e. about 3 % error, see hll.Distinct
+HLL_SPARSE_LIMIT = 64 # distinct values counted exactly before switching to a sketch
+DISTINCT_EXACT_SPAN = 86400 # seconds, windows up to this length count stations exactly
+ROLLUP_MAX_AGE = 400 # days until hourly rollups of expired messages are dropped
+GRID_CACHE_MAX_CONFIDENCE = 5 # messages with another grid needed to move a station
+LOAD_CHUNK_SIZE = 1000 # messages handed over from the loader thread at once
+LOAD_QUEUE_SIZE = 20 # chunks read ahead by the loader thread
+LOAD_TIME_BUDGET = 0.05 # seconds per update spent merging loaded messages into the store
+LOAD_REDRAW_PERIOD = 1 # seconds between redraws while loading
+JOURNAL_COMPACT_RATIO = 1.25 # journal is rewritten when it holds this many times the number of stored messages
@@ -0,0 +1,225 @@
+import struct
+from collections import namedtuple
+
+# protocol reference
+# https://sourceforge.net/p/wsjt/wsjtx/ci/master/tree/Network/NetworkMessage.hpp
+#
+# all values are big endian (QDataStream default)
+# strings are utf-8 encoded, prefixed by their length as quint32 (0xFFFFFFFF is a null string)
+# QTime is quint32 milliseconds since midnight (0xFFFFFFFF is an invalid time)
+# QDateTime is QDate (qint64 julian day) + QTime + quint8 timespec [+ qint32 offset]
+
+MAGIC = 0xadbccbda
+
+# packet types
+HEARTBEAT = 0
+STATUS = 1
+DECODE = 2
+CLEAR = 3
+QSO_LOGGED = 5
+CLOSE = 6
+WSPR_DECODE = 10
+
+NULL = 0xFFFFFFFF
+
+# precompiled readers
+_bool = struct.Struct('>?')
+_u8 = struct.Struct('>B')
+_u32 = struct.Struct('>I')
+_i32 = struct.Struct('>i')
+_u64 = struct.Struct('>Q')
+_i64 = struct.Struct('>q')
+_f64 = struct.Struct('>d')
+_header = struct.Struct('>IIII')          # magic, schema, type, length of id
+_decode = struct.Struct('>?IidII')        # new, time, snr, delta time, delta frequency, length of mode
+_flags = struct.Struct('>??')             # low confidence, off air
+_status_flags = struct.Struct('>???II')   # tx enabled, transmitting, decoding, rx df, tx df
+_wspr = struct.Struct('>?IidQi')          # new, time, snr, delta time, frequency, drift
+_u32_unpack = _u32.unpack_from
+
+Heartbeat = namedtuple('Heartbeat', ['id', 'schema', 'version', 'revision'])
+Status = namedtuple('Status', [
+    'id', 'frequency', 'mode', 'dx_call', 'report', 'tx_mode',
+    'tx_enabled', 'transmitting', 'decoding', 'rx_df', 'tx_df',
+    'de_call', 'de_grid', 'dx_grid', 'tx_watchdog', 'sub_mode', 'fast_mode',
+    'special_op_mode', 'frequency_tolerance', 'tr_period', 'configuration_name', 'tx_message'
+    ], defaults=[None] * 11) # fields after de_grid were added in later schema revisions
+Decode = namedtuple('Decode', [
+    'id', 'new', 'time', 'snr', 'delta_time', 'delta_frequency', 'mode', 'message',
+    'low_confidence', 'off_air'
+    ], defaults=[False, False])
+Clear = namedtuple('Clear', ['id', 'window'], defaults=[None])
+QSOLogged = namedtuple('QSOLogged', [
+    'id', 'time_off', 'dx_call', 'dx_grid', 'tx_frequency', 'mode', 'report_sent', 'report_received',
+    'tx_power', 'comments', 'name', 'time_on', 'operator_call', 'my_call', 'my_grid',
+    'exchange_sent', 'exchange_received', 'adif_propagation_mode'
+    ], defaults=[None] * 7)
+Close = namedtuple('Close', ['id'])
+WSPRDecode = namedtuple('WSPRDecode', [
+    'id', 'new', 'time', 'snr', 'delta_time', 'frequency', 'drift', 'callsign', 'grid', 'power',
+    'off_air'
+    ], defaults=[False])
+
+def utf8(buf, offset):
+    size, = _u32_unpack(buf, offset)
+    offset += 4
+    if size == 0 or size == NULL:
+        return '', offset
+    end = offset + size
+    if end > len(buf):
+        raise ValueError('string exceeds packet size')
+    return buf[offset : end].decode('utf-8', 'replace'), end
+
+# milliseconds since midnight, None if invalid
+def qtime(buf, offset):
+    ms, = _u32.unpack_from(buf, offset)
+    return (ms if ms != NULL else None), offset + 4
+
+# convert QTime of a decode (milliseconds since midnight utc) into seconds since epoch
+# the date is taken from now, i.e. the last occurrence of that time of day
+def qtime_to_epoch(ms, now):
+    midnight = now - now % 86400
+    t = midnight + ms / 1000
+    if t > now + 3600: # decoded before midnight, received after midnight
+        t -= 86400
+    return t
+
+# returns (julian day, milliseconds since midnight, offset from utc in seconds)
+def qdatetime(buf, offset):
+    day, = _i64.unpack_from(buf, offset)
+    ms, offset = qtime(buf, offset + 8)
+    spec, = _u8.unpack_from(buf, offset)
+    offset += 1
+    utc_offset = 0
+    if spec == 2: # Qt::OffsetFromUTC
+        utc_offset, = _i32.unpack_from(buf, offset)
+        offset += 4
+    elif spec == 3: # Qt::TimeZone, serialized as IANA id
+        _, offset = utf8(buf, offset)
+    return (day, ms, utc_offset), offset
+
+def _heartbeat(buf, offset, id):
+    schema, = _u32.unpack_from(buf, offset)
+    version, offset = utf8(buf, offset + 4)
+    revision, offset = utf8(buf, offset)
+    return Heartbeat(id, schema, version, revision)
+
+def _status(buf, offset, id):
+    frequency, = _u64.unpack_from(buf, offset)
+    mode, offset = utf8(buf, offset + 8)
+    dx_call, offset = utf8(buf, offset)
+    report, offset = utf8(buf, offset)
+    tx_mode, offset = utf8(buf, offset)
+    tx_enabled, transmitting, decoding, rx_df, tx_df = _status_flags.unpack_from(buf, offset)
+    de_call, offset = utf8(buf, offset + _status_flags.size)
+    de_grid, offset = utf8(buf, offset)
+    if offset >= len(buf):
+        return Status(id, frequency, mode, dx_call, report, tx_mode, tx_enabled, transmitting, decoding, rx_df, tx_df, de_call, de_grid)
+
+    # optional fields of later schema revisions, stop at end of packet
+    fields = [id, frequency, mode, dx_call, report, tx_mode, tx_enabled, transmitting, decoding, rx_df, tx_df, de_call, de_grid]
+    end = len(buf)
+    for reader in _status_optional:
+        if offset >= end:
+            break
+        if reader is None:
+            value, offset = utf8(buf, offset)
+        else:
+            value, = reader.unpack_from(buf, offset)
+            offset += reader.size
+        fields.append(value)
+    return Status(*fields)
+
+# readers for optional fields of status packets, None is a string
+_status_optional = (None, _bool, None, _bool, _u8, _u32, _u32, None, None)
+
+def _decode_packet(buf, offset, id):
+    new, time, snr, delta_time, delta_frequency, size = _decode.unpack_from(buf, offset)
+    offset += _decode.size
+    if size == NULL:
+        size = 0
+    mode = buf[offset : offset + size].decode('utf-8', 'replace')
+    message, offset = utf8(buf, offset + size)
+    if offset + 2 <= len(buf):
+        low_confidence, off_air = _flags.unpack_from(buf, offset)
+    else:
+        low_confidence = off_air = False
+    return Decode(id, new, time if time != NULL else None, snr, delta_time, delta_frequency, mode, message, low_confidence, off_air)
+
+def _clear(buf, offset, id):
+    window = None
+    if offset < len(buf):
+        window, = _u8.unpack_from(buf, offset)
+    return Clear(id, window)
+
+def _qso_logged(buf, offset, id):
+    time_off, offset = qdatetime(buf, offset)
+    dx_call, offset = utf8(buf, offset)
+    dx_grid, offset = utf8(buf, offset)
+    tx_frequency, = _u64.unpack_from(buf, offset)
+    offset += 8
+    fields = [id, time_off, dx_call, dx_grid, tx_frequency]
+    for _ in range(6): # mode, report sent, report received, tx power, comments, name
+        value, offset = utf8(buf, offset)
+        fields.append(value)
+
+    # optional fields of later schema revisions, stop at end of packet
+    end = len(buf)
+    if offset < end:
+        time_on, offset = qdatetime(buf, offset)
+        fields.append(time_on)
+    for _ in range(6): # operator call, my call, my grid, exchange sent, exchange received, propagation mode
+        if offset >= end:
+            break
+        value, offset = utf8(buf, offset)
+        fields.append(value)
+    return QSOLogged(*fields)
+
+def _close(buf, offset, id):
+    return Close(id)
+
+def _wspr_decode(buf, offset, id):
+    new, time, snr, delta_time, frequency, drift = _wspr.unpack_from(buf, offset)
+    callsign, offset = utf8(buf, offset + _wspr.size)
+    grid, offset = utf8(buf, offset)
+    power, = _i32.unpack_from(buf, offset)
+    offset += 4
+    off_air = False
+    if offset < len(buf):
+        off_air, = _bool.unpack_from(buf, offset)
+    return WSPRDecode(id, new, time if time != NULL else None, snr, delta_time, frequency, drift, callsign, grid, power, off_air)
+
+_readers = {
+    HEARTBEAT: _heartbeat,
+    STATUS: _status,
+    DECODE: _decode_packet,
+    CLEAR: _clear,
+    QSO_LOGGED: _qso_logged,
+    CLOSE: _close,
+    WSPR_DECODE: _wspr_decode,
+}
+
+# returns (packet type, client id, offset of payload)
+def header(buf):
+    magic, _, pkttype, size = _header.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError('not a WSJT-X packet')
+    if size == NULL:
+        size = 0
+    offset = _header.size + size
+    return pkttype, buf[_header.size : offset].decode('utf-8', 'replace'), offset
+
+# decode a datagram into one of the records above
+# fixed size fields are unpacked in place, only strings are copied when they are materialized
+# returns (packet type, record) with record being None for unsupported packet types
+def decode(data):
+    if not isinstance(data, bytes):
+        data = bytes(data) # struct reads memoryviews slower than bytes, and we need .decode() for strings
+    try:
+        pkttype, id, offset = header(data)
+        reader = _readers.get(pkttype)
+        if reader is None:
+            return pkttype, None
+        return pkttype, reader(data, offset, id)
+    except struct.error as e:
+        raise ValueError('truncated packet: %s' % e)
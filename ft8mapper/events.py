@@ -1,4 +1,12 @@
 import enum
+import time
+import logging
+import threading
+import collections
+
+from . import constants
+
+logger = logging.getLogger('events')
 
 class Type(enum.Enum):
     MESSAGE = 0
@@ -8,4 +16,155 @@ class Type(enum.Enum):
 class Event:
     def __init__(self, type, payload):
         self.type = type
-        self.payload = payload
\ No newline at end of file
+        self.payload = payload
+
+# overflow policies of EventQueue
+DROP_OLDEST = 'drop-oldest' # discard the oldest queued messages
+DROP_NEWEST = 'drop-newest' # discard incoming messages
+BLOCK = 'block'             # block the producer until the consumer catches up
+
+# bounded queue between network thread (producer) and ui (consumer)
+#   - MESSAGE events carry a list of messages, consecutive ones are merged into a single batch
+#   - BAND events replace a directly preceding BAND event of the same source
+#   - LOCATION events replace any queued LOCATION event of the same source
+# the size limit counts messages, BAND and LOCATION events are never dropped
+# BAND and LOCATION payloads must end with the source, i.e. the id of the WSJT-X instance
+# close() when the consumer stops reading, so a blocked producer does not wait forever
+class EventQueue():
+    def __init__(self, maxsize, overflow=DROP_OLDEST):
+        if overflow not in [DROP_OLDEST, DROP_NEWEST, BLOCK]:
+            raise Exception('unknown overflow policy %s' % overflow)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.events = collections.deque()
+        self.locations = {} # queued LOCATION events by source
+        self.size = 0 # number of queued messages
+        self.closed = False # consumer stopped reading, producers no longer block
+        self.condition = threading.Condition()
+
+        # statistics
+        self.dropped = 0   # messages lost due to overflow
+        self.coalesced = 0 # BAND and LOCATION events replaced by newer ones
+        self.batched = 0   # MESSAGE events merged into a preceding batch
+
+    def put(self, event):
+        with self.condition:
+            if event.type == Type.MESSAGE:
+                self._put_messages(event)
+            elif event.type == Type.BAND:
+                last = self.events[-1] if len(self.events) > 0 else None
+                if last is not None and last.type == Type.BAND and last.payload[-1] == event.payload[-1]:
+                    self.events[-1] = event
+                    self.coalesced += 1
+                else:
+                    self.events.append(event)
+            elif event.type == Type.LOCATION:
+                queued = self.locations.get(event.payload[-1])
+                if queued is not None:
+                    queued.payload = event.payload # receiver location is state, position in queue does not matter
+                    self.coalesced += 1
+                else:
+                    self.locations[event.payload[-1]] = event
+                    self.events.append(event)
+            else:
+                self.events.append(event)
+
+    def _put_messages(self, event):
+        messages = event.payload
+        excess = self.size + len(messages) - self.maxsize
+        if excess > 0:
+            if self.overflow == BLOCK:
+                while not self.closed and self.size > 0 and self.size + len(messages) > self.maxsize: # accept oversized batches into an empty queue
+                    self.condition.wait(0.5) # wake up regularly to check closed flag
+            elif self.overflow == DROP_NEWEST:
+                messages = messages[:max(0, len(messages) - excess)]
+                self.dropped += excess
+            else:
+                excess = self._drop_oldest(excess)
+                messages = messages[excess:] # incoming batch alone is too large
+                self.dropped += excess
+        if len(messages) == 0:
+            return
+
+        last = self.events[-1] if len(self.events) > 0 else None
+        if last is not None and last.type == Type.MESSAGE:
+            last.payload.extend(messages)
+            self.batched += 1
+        else:
+            self.events.append(Event(Type.MESSAGE, list(messages)))
+        self.size += len(messages)
+
+    # returns the number of messages that could not be dropped
+    def _drop_oldest(self, count):
+        for event in self.events:
+            if count <= 0:
+                break
+            if event.type == Type.MESSAGE and len(event.payload) > 0:
+                n = min(count, len(event.payload))
+                del event.payload[:n]
+                self.size -= n
+                self.dropped += n
+                count -= n
+        return count
+
+    # remove and return all queued events in chronological order
+    def get_all(self):
+        with self.condition:
+            events = [event for event in self.events if event.type != Type.MESSAGE or len(event.payload) > 0]
+            self.events.clear()
+            self.locations.clear()
+            self.size = 0
+            self.condition.notify_all()
+        return events
+
+    # wake up and never again block producers, e.g. before stopping the network thread
+    # messages are still queued, so the consumer may read them one last time
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.events)
+
+# turns callbacks of the network thread into events
+# and dispatches them in the consuming thread (ui or headless loop)
+# subclasses implement dispatch_message, dispatch_band_changed and dispatch_receiver_location
+class Receiver():
+    def init_events(self):
+        self.event_queue = EventQueue(constants.EVENT_QUEUE_SIZE, overflow=constants.EVENT_QUEUE_OVERFLOW)
+        self.reported_drops = 0
+
+    # source is the id of the sending WSJT-X instance, if any
+    @staticmethod
+    def on_message(self, caller, grid, snr, msg, source=''):
+        tval = int(time.time())   # grab timestamp
+        self.event_queue.put(Event(Type.MESSAGE, [(caller, grid, snr, msg, tval, source)]))
+
+    # all decodes of one T/R cycle, tval is the on-air time of the cycle
+    @staticmethod
+    def on_decodes(self, messages, tval, source=''):
+        self.event_queue.put(Event(Type.MESSAGE, [(caller, grid, snr, msg, tval, source) for caller, grid, snr, msg in messages]))
+
+    @staticmethod
+    def on_band_changed(self, freq, source=''):
+        self.event_queue.put(Event(Type.BAND, (freq, source)))
+
+    @staticmethod
+    def on_receiver_location(self, call, grid, source=''):
+        self.event_queue.put(Event(Type.LOCATION, (call, grid, source)))
+
+    def dispatch_events(self):
+        # event dispatching in chronological order
+        for event in self.event_queue.get_all():
+            if event.type == Type.MESSAGE:
+                for message in event.payload: # batch of messages
+                    self.dispatch_message(message)
+            elif event.type == Type.BAND:
+                self.dispatch_band_changed(event.payload)
+            elif event.type == Type.LOCATION:
+                self.dispatch_receiver_location(event.payload)
+
+        if self.event_queue.dropped != self.reported_drops:
+            logger.warning('falling behind, %d messages dropped so far (%d coalesced, %d batched events)' % (self.event_queue.dropped, self.event_queue.coalesced, self.event_queue.batched))
+            self.reported_drops = self.event_queue.dropped
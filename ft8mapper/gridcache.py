@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import logging
+
+from . import constants
+
+logger = logging.getLogger('gridcache')
+
+# last known grid of a callsign
+class GridEntry():
+    __slots__ = ('grid', 'last_seen', 'confidence')
+
+    def __init__(self, grid, last_seen, confidence=1):
+        self.grid = grid
+        self.last_seen = last_seen
+        self.confidence = confidence
+
+# callsign -> grid on any band, used for messages without grid (e.g. reports, RR73)
+# confidence counts the messages confirming the grid, messages with another grid count down,
+# so a single misdecoded grid does not move a station, but a station that moved is followed
+# entries not seen for GRID_CACHE_MAX_AGE days are forgotten when loading
+class GridCache():
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    # a message of call with grid was decoded at time t
+    def observe(self, call, grid, t):
+        entry = self.entries.get(call)
+        if entry is None:
+            self.entries[call] = GridEntry(grid, t)
+            return
+        if entry.grid == grid:
+            entry.confidence = min(entry.confidence + 1, constants.GRID_CACHE_MAX_CONFIDENCE)
+        else:
+            entry.confidence -= 1
+            if entry.confidence <= 0:
+                entry.grid = grid
+                entry.confidence = 1
+        entry.last_seen = max(entry.last_seen, t)
+
+    # returns the grid of call or None if unknown
+    def lookup(self, call):
+        entry = self.entries.get(call)
+        return entry.grid if entry is not None else None
+
+    def load(self):
+        if self.filepath is None or not os.path.isfile(self.filepath):
+            return
+        logger.info('loading grid cache')
+        try:
+            with open(self.filepath, 'r') as file:
+                entries = json.load(file)
+            limit = time.time() - constants.GRID_CACHE_MAX_AGE * 86400
+            self.entries = {call: GridEntry(grid, t, confidence) for call, (grid, t, confidence) in entries.items() if t >= limit}
+            logger.info('loaded grids of %d callsigns from file' % len(self))
+        except Exception as e:
+            logger.error('could not load grid cache file!')
+            logger.error(e)
+
+    def save(self):
+        if self.filepath is None:
+            return
+        logger.info('saving grid cache')
+        try:
+            with open(self.filepath, 'w') as file:
+                json.dump({call: [entry.grid, entry.last_seen, entry.confidence] for call, entry in self.entries.items()}, file)
+        except Exception as e:
+            logger.error('could not save grid cache file!')
+            logger.error(e)
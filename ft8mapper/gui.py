@@ -1,9 +1,7 @@
 import os
 import re
-import json
 import math
 import time
-import queue
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
@@ -12,11 +10,12 @@ import tkinter.font as tkFont
 import TKinterModernThemes
 from functools import partial
 import logging
-import datetime
 import webbrowser
 from PIL import Image, ImageTk
 
 from . import maps
+from . import store
+from . import timebins
 from . import _station
 from . import events
 from . import examples
@@ -26,7 +25,18 @@ from . import maidenhead
 
 logger = logging.getLogger('gui')
 
-class GUI(TKinterModernThemes.ThemedTKinterFrame):
+# image file per map region
+map_files = {
+    'WM': 'wm.png',
+    'NA': 'wm-na.png',
+    'SA': 'wm-sa.png',
+    'EU': 'wm-eu.png',
+    'AF': 'wm-af.png',
+    'AS': 'wm-as.png',
+    'OC': 'wm-oc.png',
+}
+
+class GUI(TKinterModernThemes.ThemedTKinterFrame, events.Receiver):
     from . import version
 
     def __init__(self, config, on_config_changed=None, on_exit=None, example_stations=False, rx_grid=None):
@@ -83,7 +93,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.plotmetric.trace_add('write', self.change_plot)
 
         self.plottime = tk.StringVar()
-        self.plottime.set([key for key in constants.age_labels if constants.age_labels[key] == self.plotx][0])
+        self.plottime.set([key for key in constants.plot_age_labels if constants.plot_age_labels[key] == self.plotx][0])
         self.plottime.trace_add('write', self.change_plot)
 
         self.mapidx = tk.StringVar()
@@ -99,7 +109,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.flag_replot = False
         self.flag_map = False
         self.update_scheduled = False
-        self.last_statwin_update = datetime.datetime.now()
+        self.last_statwin_update = time.time()
 
         self.canvas = None
         self.mto = {}
@@ -115,20 +125,20 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             else:
                 raise Exception('locator of receiver is invalid!')
             logger.info('setting receiver location to %s.' % self.rx_grid)
-            self.rx_station = _station.Station(datetime.datetime.now().timestamp(), constants.RX_CALL, self.rx_grid, 0, 0)
+            self.rx_station = _station.Station(time.time(), constants.RX_CALL, self.rx_grid, 0, 0)
         self.spots = set() # list of spot ids, i.e. plotted stations, on map
-        self.station_data = {str(band): {} for _, _ , band, _ in constants.band_list}
-        self.message_data = [] # list of station messages (timestamp, call, grid, snr/report)
-        self.last_remove_old_data = None
+        self.store = store.Store(self.config, persist=not self.example_stations)
         self.selected_call = None
 
         # inter-thread communication queue
-        self.event_queue = queue.Queue()
+        self.init_events()
 
         self.clear()
-        self.load_stations()
-        self.load_messages()
-        self.remove_old_data()
+        self.store.start_loading() # history fills in while the ui is shown, see update()
+        self.loading = True
+        self.last_load_redraw = time.time()
+        self.flag_message = True
+        self.map_images = {} # region -> key -> image, loaded on first use
         self.create_ui()
 
         if self.example_stations:
@@ -137,50 +147,6 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
 
         self.settings_open = False
 
-    @staticmethod
-    def default_config(config):
-        config['window']['dark'] = 0 # use light mode as default
-        config['window']['position'] = '1288x900+30+30'
-        config['window']['sort'] = 'C' # sort by call
-        config['window']['scale'] = 0 # use small map
-        config['window']['rangerings'] = 0 # no range rings
-        config['window']['curmap'] = 'WM' # show world map
-        config['window']['band'] = constants.any_band
-        config['window']['agelimit'] = 86400 # 1 day
-        config['window']['plot'] = {}
-        config['window']['plot']['x'] = 1800 # 30 minutes
-        config['window']['plot']['y'] = 'M' # plot messages per minute
-        config['window']['list'] = {} # visible table columns
-        config['window']['list']['grid'] = True
-        config['window']['list']['band'] = True
-        config['window']['list']['report'] = False
-        config['window']['list']['range'] = False
-        config['window']['list']['age'] = False
-        config['window']['list']['msgs'] = False
-        config['window']['list']['lastmsg'] = False
-        config['lookup'] = constants.lookup_QRZ
-        config['rx'] = '' # unknown receiver location
-
-        # initial slider positions for the maps
-        config['window']['map'] = {
-            # small map
-            'WM0': (0.128, 0.250),
-            'NA0': (0.250, 0.245),
-            'SA0': (0.200, 0.110),
-            'EU0': (0.110, 0.308),
-            'AF0': (0.185, 0.489),
-            'AS0': (0.324, 0.303),
-            'OC0': (0.230, 0.343),
-            # large map
-            'WM1': (0.128, 0.250),
-            'NA1': (0.250, 0.245),
-            'SA1': (0.200, 0.110),
-            'EU1': (0.110, 0.308),
-            'AF1': (0.185, 0.489),
-            'AS1': (0.324, 0.303),
-            'OC1': (0.230, 0.343)
-        }
-
     def save_config(self):
         if self.on_config_changed is not None:
             logger.debug('saving GUI configuration')
@@ -206,52 +172,6 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             self.config['rx'] = self.rx_station.grid if self.rx_station is not None else ''
             self.on_config_changed()
 
-    def load_stations(self):
-        logger.info('loading stations file')
-        try:
-            stations_filepath = os.path.join(self.config['configdir'], 'stations.json')
-            if os.path.isfile(stations_filepath):
-                with open(stations_filepath, 'r') as file:
-                    self.station_data = json.load(file, object_hook=_station.from_json)
-                self.flag_message = True
-                logger.info('loaded %d stations from file' % (sum(len(self.station_data[band]) for band in self.station_data)))
-        except Exception as e:
-            logger.error('could not load stations file!')
-            logger.error(e)
-
-    def save_stations(self):
-        logger.info('saving stations file')
-        try:
-            stations_filepath = os.path.join(self.config['configdir'], 'stations.json')
-            with open(stations_filepath, 'w') as file:
-                json.dump(self.station_data, file, cls=_station.Serializer, indent=1)
-        except Exception as e:
-            logger.error('could not load stations file!')
-            logger.error(e)
-
-    def load_messages(self):
-        logger.info('loading messages file')
-        try:
-            messages_filepath = os.path.join(self.config['configdir'], 'messages.json')
-            if os.path.isfile(messages_filepath):
-                with open(messages_filepath, 'r') as file:
-                    self.message_data = json.load(file, object_hook=_station.from_json)
-                self.flag_message = True
-            logger.info('loaded %d messages from file' % (len(self.message_data)))
-        except Exception as e:
-            logger.error('could not load messages file!')
-            logger.error(e)
-
-    def save_messages(self):
-        logger.info('saving messages file')
-        try:
-            messages_filepath = os.path.join(self.config['configdir'], 'messages.json')
-            with open(messages_filepath, 'w') as file:
-                json.dump(self.message_data, file, cls=_station.Serializer, indent=1)
-        except Exception as e:
-            logger.error('could not load messages file!')
-            logger.error(e)
-
     #
     # delspots - remove the qth's from canvas (clears spots from map, but they stay in mem)
     #
@@ -265,15 +185,14 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
     def clear(self):
         logger.debug('clearing data')
         self.delete_spots() #TODO dangerous, deleting and quitting leads to all persistet data being lost!
-        for band in self.station_data:
-            self.station_data[band].clear()
-        self.message_data.clear()
+        self.store.clear()
 
     #
     # on_clear - clear canvas and the list that maintains qth's (clears everything)
     #
     def on_clear(self):
         self.clear()
+        self.store.clear_persisted()
 
     #
     # on_spot_enter - create lower left textbox when you hover over dot
@@ -290,23 +209,24 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
 
         # replace own station with last heard station in same grid
         if call == constants.RX_CALL:
-            stations = [self.station_data[str(band)][call] for band in self.station_data for call in self.station_data[band] if self.station_data[band][call].grid == self.rx_grid]
+            stations = self.store.stations_in_grid(self.rx_grid)
             if len(stations) == 0:
                 return
             stations.sort(key=lambda s: s.time, reverse=True)
             call = stations[0].call
 
-        bands = [band for _, _, band, _ in constants.band_list if call in self.station_data[str(band)]] # one station can transmit on multiple bands simultaneously
+        bands = [band for _, _, band, _ in constants.band_list if call in self.store.station_data[str(band)]] # one station can transmit on multiple bands simultaneously
         if len(bands) == 0:
             return
 
-        now = datetime.datetime.now()
-        stations = [self.station_data[str(band)][call] for band in bands]       # grab tip from click
+        now = time.time()
+        stations = [self.store.station_data[str(band)][call] for band in bands]       # grab tip from click
         stations.sort(key=lambda s: s.time, reverse=True) # sort by time last heard
 
         field = []
         field.append('Call     %s' % stations[0].call)
         field.append('Grid     %s' % stations[0].grid)
+        field.append('Msgs     %d' % self.store.message_data.count(stations[0].call))
 
         if self.rx_station is not None:
             field.append(' Range   %.0f km' % (maidenhead.locator_distance(self.rx_station.grid, stations[0].grid) / 1000.0))
@@ -316,10 +236,10 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             field.append('Band     %d m' % stations[i].band)
             field.append(' Report  %s' % stations[i].report)
             if self.agelimit > 24 * 60 * 60: # more than 1 day
-                field.append(' Date    %s' % stations[i].time.strftime('%y-%m-%d')) #  show date, too
+                field.append(' Date    %s' % stations[i].datetime().strftime('%y-%m-%d')) #  show date, too
             field.append(' Time    %s' % stations[i].utc())
 
-            age = (now - stations[i].time).total_seconds()
+            age = now - stations[i].time
             age_human_readable = ''
             if age > 24 * 60 * 60:
                 age_human_readable += '%dd ' % (age // (24 * 60 * 60))
@@ -333,9 +253,9 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             if len(stations[i].message) > 0:
                 field.append(' Message %s' % stations[i].message)
 
-            same_grid = [call for band in self.station_data for call in self.station_data[band] if self.station_data[band][call].grid == stations[0].grid]
-            if len(same_grid) > 1:
-                field.append('%+d stations in %s' % (len(same_grid)  - 1, stations[0].grid))
+            same_grid = len(self.store.grid_index.get(stations[0].grid, ()))
+            if same_grid > 1:
+                field.append('%+d stations in %s' % (same_grid - 1, stations[0].grid))
 
         self.details_window.insert(tk.END, '\n'.join(field))
         self.details_window.configure(height=len(field))
@@ -392,6 +312,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
 
     def on_filter_time_changed(self, *_):
         self.agelimit = constants.age_labels[self.tclick.get()]    # convert that to seconds
+        self.store.ensure_loaded(time.time() - self.agelimit)
         self.flag_filter = True
         logger.debug('age limit changed to %d seconds' % self.agelimit)
 
@@ -425,24 +346,8 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         logger.debug('changing map to %s with scale x%d' % (self.CURMAP, 1 + self.map_scale.get()))
         
         # load image for this map
-        images = None
-        if self.CURMAP == 'WM':
-            images = self.bg_w
-        elif self.CURMAP == 'NA':
-            images = self.bg_na
-        elif self.CURMAP == 'SA':
-            images = self.bg_sa
-        elif self.CURMAP == 'EU':
-            images = self.bg_eu
-        elif self.CURMAP == 'AF':
-            images = self.bg_af
-        elif self.CURMAP == 'AS':
-            images = self.bg_as
-        elif self.CURMAP == 'OC':
-            images = self.bg_oc
-
         key = '%s-%s' % ('dark' if self.dark_mode.get() == 1 else 'light', 'large' if self.map_scale.get() == 1 else 'small')
-        image = images[key]
+        image = self.map_image(self.CURMAP, key)
         self.canvas.delete('MAP')
         self.canvas.create_image(image.width() // 2, image.height() // 2, image=image, tag='MAP')
         self.delete_spots()
@@ -538,14 +443,14 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             else:
                 self.sortby = '!' + self.sortby # reverse sorting order
             self.flag_list = True
-        elif word in [call for band in self.station_data for call in self.station_data[band]]:
+        elif word in [call for band in self.store.station_data for call in self.store.station_data[band]]:
             self.selected_call = word
             self.show_call_details(word)
         else:
             # sanity check grid data
             if maidenhead.locator_valid(word):
                 self.flashgrid(word)
-        #    grid = [self.station_data[band][call].grid for band in self.station_data for call in self.station_data[band] if self.station_data[band][call].call == word][0]
+        #    grid = [self.store.station_data[band][call].grid for band in self.store.station_data for call in self.store.station_data[band] if self.store.station_data[band][call].call == word][0]
         #    self.flashgrid(grid)
 
     def listlookup(self, event):
@@ -600,14 +505,15 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.save_map_position()
         self.save_config()
 
-        if not self.example_stations: # when using example station data, do not save them!
-            self.save_stations()
-            self.save_messages()
-
-        # important: stop network while ui is still alive
-        # because callbacks will otherwise try to access tkinter while no main loop is running
+        # stop network first, so no more events arrive and pending decodes are delivered
         if self.on_exit is not None:
             self.on_exit()
+        self.store.poll_loading() # keep the history in order
+        self.dispatch_events()
+
+        if not self.example_stations: # when using example station data, do not save them!
+            self.store.save()
+        self.store.close()
         self.wndo.destroy()  # destroy window and kill app
 
     # canvas scroll function
@@ -665,6 +571,24 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             self.move_map(None)
             self.once = True
 
+    # images used for maps, each variant is generated when it is shown first
+    # dark mode variants are generated on the fly
+    def map_image(self, region, key):
+        images = self.map_images.setdefault(region, {})
+        if key not in images:
+            logger.debug('loading map image %s (%s)' % (region, key))
+            with Image.open(os.path.join(self.config['configdir'], 'maps', map_files[region])) as image:
+                theme, size = key.split('-')
+                if theme == 'dark':
+                    image = image.convert('HSV')
+                    h, s, v = image.split()
+                    v = v.point(lambda p: 255 - p) # invert value channel only
+                    image = Image.merge('HSV', [h, s, v])
+                if size == 'small':
+                    image = image.resize((image.width // 2, image.height // 2))
+                images[key] = ImageTk.PhotoImage(image)
+        return images[key]
+
     def create_ui(self):
         logger.debug('creating ui')
         self.wndo.protocol('WM_DELETE_WINDOW', self.confirm_quit)   # catch if they hit windows 'X'
@@ -672,28 +596,6 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.wndo.title(self.version.APPNAME)    # title
         self.wndo.bind("<Configure>", self.on_resize)
 
-        # images used for maps
-        # generate dark mode variants on the fly
-        def load_map_image(filepath):
-            with Image.open(filepath) as image:
-                images = {}
-                images['light-large'] = ImageTk.PhotoImage(image)
-                images['light-small'] = ImageTk.PhotoImage(image.resize((image.width // 2, image.height // 2)))
-                image = image.convert('HSV')
-                h, s, v = image.split()
-                v = v.point(lambda p: 255 - p) # invert value channel only
-                image = Image.merge('HSV', [h, s, v])
-                images['dark-large'] = ImageTk.PhotoImage(image)
-                images['dark-small'] = ImageTk.PhotoImage(image.resize((image.width // 2, image.height // 2)))
-            return images
-        self.bg_w  = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm.png'))
-        self.bg_na = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-na.png'))
-        self.bg_sa = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-sa.png'))
-        self.bg_eu = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-eu.png'))
-        self.bg_af = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-af.png'))
-        self.bg_as = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-as.png'))
-        self.bg_oc = load_map_image(os.path.join(self.config['configdir'], 'maps', 'wm-oc.png'))
-
         # bottom bar
         wframe = ttk.Frame(self.wndo)
         wframe.grid(row=3, column=0, columnspan=4, sticky='swe')
@@ -795,6 +697,9 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         ttk.Label(group_stats, text='msg/min').grid(row=1, column=2, sticky='we', padx=(0,4))
         ttk.Label(group_stats, text='stations').grid(row=2, column=2, sticky='we', padx=(0,4))
         ttk.Label(group_stats, text='squares').grid(row=3, column=2, sticky='we', padx=(0,4))
+        # shown while the history is loading
+        self.progress_loading = ttk.Progressbar(group_stats, orient='horizontal', mode='determinate', maximum=100)
+        self.progress_loading.grid(row=5, column=0, columnspan=3, sticky='we', padx=4, pady=(4,0))
 
         # clear and quit buttons added
         group_general = ttk.LabelFrame(wframe, text='Program')
@@ -833,8 +738,8 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
 
         group_plot_control = tk.Frame(group_plot)
         group_plot_control.pack(side='bottom', anchor='w')
-        graph_metric = ttk.Combobox(group_plot_control, textvariable=self.plotmetric, values=list(constants.plot_metrics.keys()), state='readonly', width=11)
-        graph_time = ttk.Combobox(group_plot_control, textvariable=self.plottime, values=list(constants.age_labels.keys()), state='readonly', width=max(len(k) for k in constants.age_labels.keys()))
+        graph_metric = ttk.Combobox(group_plot_control, textvariable=self.plotmetric, values=list(constants.plot_metrics.keys()), state='readonly', width=max(len(k) for k in constants.plot_metrics.keys()))
+        graph_time = ttk.Combobox(group_plot_control, textvariable=self.plottime, values=list(constants.plot_age_labels.keys()), state='readonly', width=max(len(k) for k in constants.plot_age_labels.keys()))
         graph_metric.grid(row=0, column=0)
         graph_time.grid(row=0, column=1)
 
@@ -844,7 +749,8 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.wndo.after(constants.UPDATE_PERIOD, self.update)
 
     def change_plot(self, *_):
-        self.plotx = constants.age_labels[self.plottime.get()]
+        self.plotx = constants.plot_age_labels[self.plottime.get()]
+        self.store.ensure_loaded(time.time() - min(self.plotx, constants.MAX_MESSAGE_AGE)) # older messages are rolled up
         self.ploty = constants.plot_metrics[self.plotmetric.get()]
         self.flag_replot = True
 
@@ -914,11 +820,11 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
 
     def update_listwin(self):
         logger.debug('updating listwin')
-        now = datetime.datetime.now()
+        now = time.time()
 
-        stations = list(self.station_data[band][call] for band in self.station_data for call in self.station_data[band])
+        stations = list(self.store.station_data[band][call] for band in self.store.station_data for call in self.store.station_data[band])
         stations = [station for station in stations if station.band == self.bandfilter or self.bandfilter == constants.any_band] # filter by band
-        stations = [station for station in stations if now - station.time <= datetime.timedelta(seconds=self.agelimit)] # filter by age
+        stations = [station for station in stations if now - station.time <= self.agelimit] # filter by age
         stations.sort(key=lambda entry: int(entry.band), reverse=True) # sort by band
 
         pos = self.text_wd.yview()
@@ -948,7 +854,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             visible_columns.append('Last Msg')
 
         if 'Msgs' in visible_columns:
-            message_count = {entry.call: len([m for m in self.message_data if m.call == entry.call]) for entry in stations}
+            message_count = {entry.call: self.store.message_data.count(entry.call) for entry in stations}
         if 'Range' in visible_columns:
             distances = {entry.call: maidenhead.locator_distance(self.rx_station.grid, entry.grid) for entry in stations}
 
@@ -975,7 +881,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         if self.sortby.endswith('Call'): # by call
             stations.sort(key=lambda entry: entry.call)
         elif self.sortby.endswith('Msgs'): # by message count
-            message_count = {entry.call: len([m for m in self.message_data if m.call == entry.call]) for entry in stations}
+            message_count = {entry.call: self.store.message_data.count(entry.call) for entry in stations}
             stations.sort(key=lambda entry: message_count[entry.call], reverse=True)
         elif self.sortby.endswith('Range') and self.rx_station is not None: # by distance to receiver location, i.e. range
             distances = {entry.call: maidenhead.locator_distance(self.rx_station.grid, entry.grid) for entry in stations}
@@ -1002,7 +908,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             if self.list_range.get():
                 row.append('%5.0fkm' % (distances[station.call] / 1000))
             if self.list_age.get():
-                row.append('%ds' % (now - station.time).total_seconds())
+                row.append('%ds' % (now - station.time))
             if self.list_msgs.get():
                 row.append('%d' % message_count[station.call])
 
@@ -1029,111 +935,52 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
     def update_statwin(self):
         logger.debug('updating statwin')
         # filter based on viewing configuration (band and 'last')
-        now = datetime.datetime.now()
-        band_filtered_data = self.message_data
-        if self.bandfilter != constants.any_band:
-            band_filtered_data = [m for m in band_filtered_data if m.band == self.bandfilter]
-        filtered_data = [m for m in band_filtered_data if now - m.time < datetime.timedelta(seconds=self.agelimit)]
-        last_minute = [m for m in filtered_data if now - m.time < datetime.timedelta(minutes=1)]
-
-        maxrange = None
-        if self.rx_station is not None and len(filtered_data) > 0:
-            ranges = [maidenhead.locator_distance(self.rx_station.grid, m.grid) / 1000.0 for m in filtered_data]
-            maxrange = max(ranges) # km
-        decoderate = len(last_minute)
-        nostations = len(set([m.call for m in filtered_data]))
-        nosquares = len(set([m.grid for m in filtered_data]))
-        timespan = (filtered_data[-1].time if len(filtered_data) > 0 else now) - (filtered_data[0].time if len(filtered_data) > 0 else now)
-
-        self.label_maxrange.config(text=('%.0f' % maxrange) if maxrange is not None else '?')
-        self.label_maxrange.bind('<Button-1>', lambda _: self.flashgrid(filtered_data[ranges.index(maxrange)].grid))
+        now = time.time()
+        rx_grid = self.rx_station.grid if self.rx_station is not None else None
+        window = self.store.window_stats(self.agelimit, self.bandfilter, rx_grid)
+        last_minute = self.store.window_stats(60, self.bandfilter)
+
+        maxrange = window.max_range() # km, grid
+        decoderate = last_minute.count
+        nostations, nosquares = self.store.heard(self.agelimit, self.bandfilter, rx_grid)
+        timespan = window.timespan(self.store.message_data)
+
+        self.label_maxrange.config(text=('%.0f' % maxrange[0]) if maxrange is not None else '?')
+        if maxrange is not None:
+            self.label_maxrange.bind('<Button-1>', lambda _: self.flashgrid(maxrange[1]))
         self.label_decoderate.config(text='%d' % decoderate)
         self.label_nostations.config(text='%d' % nostations)
         self.label_nosquares.config(text='%d' % nosquares)
-        self.label_timespan.config(text='%2d h %02d min %02d sec' % (timespan.total_seconds() // 3600, (timespan.total_seconds() / 60) % 60, timespan.total_seconds() % 60))
+        self.label_timespan.config(text='%2d h %02d min %02d sec' % (timespan // 3600, (timespan / 60) % 60, timespan % 60))
 
         # draw plot window
         self.plots.delete('GRAPH')
         line_color = ttk.Style().lookup(ttk.Button().winfo_class(), "foreground", default="gray")
         axes_color = ttk.Style().lookup(ttk.Frame().winfo_class(), "foreground", default="black")
         text_color = ttk.Style().lookup(ttk.Label().winfo_class(), "foreground", default="black")
-        graph_data = [m for m in band_filtered_data if now - m.time < datetime.timedelta(seconds=self.plotx)]
-        if len(graph_data) > 0:
+        t_res, tic_res, label_res, label_unit = constants.plot_resolutions[self.plotx]
+        num_bins = self.plotx // t_res
+        cells = self.store.time_bins(self.plotx).read(now, num_bins, self.bandfilter) # current bin first
+        if any(cell is not None for cell in cells):
             if self.plots.winfo_width() == 1: # widget not fully drawn yet
                 self.flag_replot = True # try again
                 logging.debug('requesting replot again')
                 return
 
-            t_res, tic_res, label_res, label_unit = constants.plot_resolutions[self.plotx]
-            num_bins = self.plotx // t_res
-            now.fromtimestamp(now.timestamp() // t_res * t_res)
-
-            y = [[] for _ in range(num_bins)]
-            y_default = 0.0
-            if self.ploty == 'M': # mean number of messages
+            y_min, y_mean, y_max = timebins.plot_values(cells, self.ploty, t_res, self.rx_station.grid if self.rx_station is not None else None)
+            if self.ploty in ('M', 'S', 'G'): # counts
                 total_min = 0
                 total_max = None
                 min_mean_max = False
-                histogram = [[] for _ in range(0, self.plotx, t_res)] # number of messages per minute
-                for m in graph_data:
-                    bin = (now - m.time).total_seconds() / t_res
-                    bin = int(bin)
-                    histogram[bin].append(1)
-                for b in range(len(histogram)):
-                    bin = b
-                    bin = int(bin)
-                    y[bin].append(len(histogram[b]) * 60 / t_res)
-            elif self.ploty == 'R': # report/SNR
+            elif self.ploty in ('R', 'P'): # report/SNR
                 total_min = None # -49
                 total_max = None #  50
                 min_mean_max = True
-                for m in graph_data:
-                    bin = (now - m.time).total_seconds() / t_res
-                    bin = int(bin)
-                    y[bin].append(m.report)
-            elif self.ploty == 'D': # distance to (current!) receiver location
+            else: # distance to (current!) receiver location
                 total_min = 0
                 total_max = None
                 min_mean_max = True
-                for m in graph_data:
-                    bin = (now - m.time).total_seconds() / t_res
-                    bin = int(bin)
-                    if self.rx_station is not None:
-                        distance = maidenhead.locator_distance(self.rx_station.grid, m.grid) / 1000.0
-                    else:
-                        distance = y_default
-                    y[bin].append(distance)
-            elif self.ploty == 'S': # number of unique stations heard
-                total_min = 0
-                total_max = None
-                min_mean_max = False
-                unique = [set() for _ in range(num_bins)]
-                for bin in range(num_bins):
-                    y[bin].append(y_default)
-                for m in graph_data:
-                    bin = (now - m.time).total_seconds() / t_res
-                    bin = int(bin)
-                    if m.call not in unique[bin]:
-                        y[bin][0] += 1
-                        unique[bin].add(m.call)
-            elif self.ploty == 'G': # number of unique grids heard
-                total_min = 0
-                total_max = None
-                min_mean_max = False
-                unique = [set() for _ in range(num_bins)]
-                for bin in range(num_bins):
-                    y[bin].append(y_default)
-                for m in graph_data:
-                    bin = (now - m.time).total_seconds() / t_res
-                    bin = int(bin)
-                    if m.grid not in unique[bin]:
-                        y[bin][0] += 1
-                        unique[bin].add(m.grid)
-
-            # calculate min, mean and max
-            y_mean = [(sum(x) / len(x)) if len(x) > 0 else y_default for x in y]
-            y_min  = [min(x) if len(x) > 0 else y_default for x in y]
-            y_max  = [max(x) if len(x) > 0 else y_default for x in y]
+
             y = [y_max, y_mean, y_min]
             if total_min is None:
                 total_min = min(y_min)
@@ -1156,7 +1003,7 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             self.plots.delete(label_x_min)
 
             # build graph
-            #TODO round wall clock time
+            # bins are aligned to wall clock time, the newest one is still filling
             pad = 4      # padding within the canvas
             bin_pad = 2  # bars are drawn a bit smaller so they do not touch
             tic_size = 3 # half length of tics on axes
@@ -1213,14 +1060,14 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
             self.plots.create_text(2, 2, text='no data', fill=text_color, tags='GRAPH', anchor='nw')
 
     def redraw(self):
-        now = datetime.datetime.now()
+        now = time.time()
         
-        for band in self.station_data:
-            for call in self.station_data[band]:
-                station = self.station_data[band][call]
+        for band in self.store.station_data:
+            for call in self.store.station_data[band]:
+                station = self.store.station_data[band][call]
                 if self.bandfilter != constants.any_band and int(band) != self.bandfilter:
                     self.hide_station(station.call) # band does not match current view filter
-                elif now - station.time > datetime.timedelta(seconds=self.agelimit):
+                elif now - station.time > self.agelimit:
                     self.hide_station(station.call) # too old
                 else:
                     self.plot_station(station.call, station.grid, station.band)
@@ -1233,42 +1080,20 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
                 return True
             self.plot(x0, y0, x1, y1, 'white', self.rx_station.call, lift=True)
 
-    def remove_old_data(self):
-        now = datetime.datetime.now()
-        if self.last_remove_old_data is not None and now - self.last_remove_old_data < datetime.timedelta(minutes=constants.CLEAN_PERIOD):
-            return # limit frequency of cleanup
-
-        threshold = datetime.timedelta(seconds=constants.MAX_MESSAGE_AGE)
-        removed_stations = 0
-        removed_messages = 0
-        for band in self.station_data: # iterate all bands
-            for call in list(self.station_data[band].keys()): # iterate all heard stations
-                if now - self.station_data[band][call].time > threshold:
-                    del self.station_data[band][call] # remove old station
-                    removed_stations += 1
-        for message in self.message_data:
-            if now - message.time > threshold:
-                self.message_data.remove(message)
-                removed_messages += 1
-        self.last_remove_old_data = now
-        logger.info('removed %d stations and %d messages that were older than %s.' % (removed_stations, removed_messages, str(constants.MAX_MESSAGE_AGE)))
-
     def update(self):
-        # event dispatching in chronological order
-        while True:
-            try:
-                event = self.event_queue.get(block=False)
-
-                if event.type == events.Type.MESSAGE:
-                    self.dispatch_message(event.payload)
-                elif event.type == events.Type.BAND:
-                    self.dispatch_band_changed(event.payload)
-                elif event.type == events.Type.LOCATION:
-                    self.dispatch_receiver_location(event.payload)
-            except queue.Empty:
-                break
-
-        self.remove_old_data()
+        if self.loading:
+            # decoded messages wait in the event queue until the history is complete, so it stays in order
+            if self.store.poll_loading(constants.LOAD_TIME_BUDGET) or not self.store.loading(): # finished, or by clearing
+                self.on_loaded()
+            else:
+                self.progress_loading.config(value=100 * self.store.load_progress())
+                if time.time() - self.last_load_redraw > constants.LOAD_REDRAW_PERIOD:
+                    self.last_load_redraw = time.time()
+                    self.flag_message = True
+        else:
+            self.dispatch_events()
+            self.store.commit()
+            self.store.remove_old_data()
 
         if self.flag_filter or self.flag_message or self.flag_band_change or self.flag_receiver_location or self.flag_map:
             self.redraw()
@@ -1276,11 +1101,11 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         if self.flag_list or self.flag_filter or self.flag_message or self.flag_band_change or self.flag_receiver_location:
             self.update_listwin()
 
-        if datetime.datetime.now() - self.last_statwin_update > datetime.timedelta(seconds=constants.plot_resolutions[self.plotx][0]): # when data moves to another bin -> replot
+        if time.time() - self.last_statwin_update > constants.plot_resolutions[self.plotx][0]: # when data moves to another bin -> replot
             self.flag_replot = True
         if self.flag_replot or self.flag_filter or self.flag_message or self.flag_band_change or self.flag_receiver_location:
             self.update_statwin()
-            self.last_statwin_update = datetime.datetime.now()
+            self.last_statwin_update = time.time()
 
         # reset flags (except flag_replot)
         self.flag_message = False
@@ -1293,6 +1118,13 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         self.wndo.update()
         self.wndo.after(constants.UPDATE_PERIOD, self.update)
 
+    def on_loaded(self):
+        self.loading = False
+        self.progress_loading.grid_remove()
+        self.store.ensure_loaded(time.time() - min(max(self.agelimit, self.plotx), constants.MAX_MESSAGE_AGE)) # filters may have changed while loading
+        self.store.remove_old_data()
+        self.flag_message = True
+
     def run_loop(self):
         # ThemedTKinterFrame.run causes multiple problems
         #   - it sets the minimal window size to the initial window size
@@ -1300,58 +1132,20 @@ class GUI(TKinterModernThemes.ThemedTKinterFrame):
         # We use this function as a simple replacement.
         self.root.mainloop()
 
-    @staticmethod
-    def on_message(self, caller, grid, snr, msg):
-        tval = int(time.time())   # grab timestamp
-        self.event_queue.put(events.Event(events.Type.MESSAGE, (caller, grid, snr, msg, tval)))
-
-    @staticmethod
-    def on_band_changed(self, freq):
-        self.event_queue.put(events.Event(events.Type.BAND, freq))
-
-    @staticmethod
-    def on_receiver_location(self, call, grid):
-        self.event_queue.put(events.Event(events.Type.LOCATION, (call, grid)))
-
     def dispatch_message(self, args):
-        caller, grid, snr, msg, tval = args
-
-        if self.sband == constants.any_band:
-            return # band not known yet
-        if grid == '': # no grid in this message
-            if caller in self.station_data[str(self.sband)]: # if heard before
-                grid = self.station_data[str(self.sband)][caller].grid # keep previous grid
-
-        logger.debug('adding station %s in %s (snr=%s, msg="%s") heard in %d m band' % (caller, grid, snr, msg, self.sband))
-        station = _station.Station(
-            tval,
-            caller,
-            grid,
-            self.sband,
-            snr,
-            msg
-            )
-
-        self.station_data[str(self.sband)][caller] = station
-        self.message_data.append(station)
-
-        self.flag_message = True
+        if self.store.add_message(*args) is not None:
+            self.flag_message = True
 
     def dispatch_band_changed(self, args):
-        freq = args
-
-        for band_lower, band_upper, band, _ in constants.band_list:              # step thru bandlist using freq
-            if  band_lower <= freq < band_upper:    # in this band?
-                self.wndo.title('%s - %d m' % (self.version.APPNAME, band))     # yes, set title
-                self.sband = int(band)
-                self.flag_band_change = True
-                break
-        
-        if not self.flag_band_change:
-            logging.warn('out of band frequency %d Hz detected.' % freq)
+        band = self.store.set_band(*args)
+        if band is not None:
+            self.sband = band
+            bands = sorted(set(self.store.source_bands.values()), reverse=True)
+            self.wndo.title('%s - %s' % (self.version.APPNAME, ', '.join('%d m' % b for b in bands)))
+            self.flag_band_change = True
 
     def dispatch_receiver_location(self, args):
-        _, grid = args
+        _, grid, _ = args
 
         # store receiving station
         tval = int(time.time())   # grab timestamp
@@ -0,0 +1,66 @@
+import time
+import signal
+import logging
+import threading
+
+from . import store
+from . import events
+from . import constants
+
+logger = logging.getLogger('headless')
+
+# collects messages without any user interface, i.e. without tkinter and PIL
+# data is persisted periodically and when exiting
+class Headless(events.Receiver):
+    from . import version
+
+    def __init__(self, config, on_exit=None):
+        self.config = config
+        self.on_exit = on_exit
+        self.stopped = threading.Event() # set by stop(), possibly before run_loop() started
+
+        self.store = store.Store(self.config)
+        self.init_events()
+
+        self.store.load()
+        self.store.remove_old_data()
+
+    def dispatch_message(self, args):
+        self.store.add_message(*args)
+
+    def dispatch_band_changed(self, args):
+        band = self.store.set_band(*args)
+        if band is not None:
+            logger.info('"%s" is now on %d m band' % (args[-1], band))
+
+    def dispatch_receiver_location(self, args):
+        pass # only used for plotting
+
+    def stop(self, *_):
+        logger.info('stop requested')
+        self.stopped.set()
+
+    def run_loop(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        last_save = time.time()
+        try:
+            while not self.stopped.wait(constants.UPDATE_PERIOD / 1000):
+                self.dispatch_events()
+                self.store.commit()
+                self.store.remove_old_data()
+
+                if time.time() - last_save > constants.SAVE_PERIOD * 60:
+                    self.store.save()
+                    last_save = time.time()
+        except KeyboardInterrupt:
+            logger.info('quit by user')
+        finally:
+            self.close()
+
+    def close(self):
+        logger.info('close %s' % self.version.APPNAME)
+        if self.on_exit is not None:
+            self.on_exit() # stop network first, so no more events arrive
+        self.dispatch_events()
+        self.store.save()
+        self.store.close()
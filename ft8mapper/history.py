@@ -0,0 +1,256 @@
+import bisect
+import logging
+from array import array
+
+from . import _station
+
+logger = logging.getLogger('history')
+
+# maps strings to small integers, each distinct string is stored once
+class Interner():
+    def __init__(self):
+        self.values = [] # id -> string
+        self.ids = {}    # string -> id
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, id):
+        return self.values[id]
+
+    def intern(self, value):
+        id = self.ids.get(value)
+        if id is None:
+            id = len(self.values)
+            self.values.append(value)
+            self.ids[value] = id
+        return id
+
+    def get(self, value):
+        return self.ids.get(value)
+
+    def clear(self):
+        self.values.clear()
+        self.ids.clear()
+
+# statistics of all messages of a callsign in the history
+class CallStats():
+    __slots__ = ('count', 'first', 'last', 'snr_min', 'snr_max', 'snr_sum', 'times', 'start')
+
+    def __init__(self):
+        self.count = 0
+        self.first = None # time of first message
+        self.last = None  # time of last message
+        self.snr_min = None
+        self.snr_max = None
+        self.snr_sum = 0
+        self.times = array('d') # times of the messages, ascending, 8 bytes per message
+        self.start = 0 # times[start:] are in the history, expired ones are dropped in bulk
+
+    def snr_mean(self):
+        return self.snr_sum / self.count if self.count > 0 else None
+
+# history of all stored messages as parallel columns, ordered by time
+#   time: seconds since epoch
+#   band: band in meters
+#   snr: report in dB, limited to -128..127
+#   call, grid, message, source: ids of interned strings
+# rows are only turned into Station objects when they are read
+#
+# expired rows are dropped from the head by moving self.head, columns are compacted
+# once more than half of them is expired, i.e. expiry is amortized O(k) for k expired rows
+# indices used by the methods below are relative to the head
+#
+# self.stats holds CallStats per callsign, updated on every append and expiry
+# a message of a callsign is found by its time (see _rows_of), so rows inserted out of order
+# do not change the index of other callsigns
+class MessageHistory():
+    def __init__(self):
+        self.time = array('d')
+        self.band = array('B')
+        self.snr = array('b')
+        self.call = array('I')
+        self.grid = array('I')
+        self.message = array('I')
+        self.source = array('I')
+        self.head = 0 # physical index of the oldest row
+        self.stats = {} # callsign -> CallStats
+        self.calls = Interner()
+        self.grids = Interner()
+        self.messages = Interner()
+        self.sources = Interner()
+
+    def _columns(self):
+        return (self.time, self.band, self.snr, self.call, self.grid, self.message, self.source)
+
+    def __len__(self):
+        return len(self.time) - self.head
+
+    def __getitem__(self, i):
+        i += self.head
+        return _station.Station(
+            self.time[i],
+            self.calls[self.call[i]],
+            self.grids[self.grid[i]],
+            self.band[i],
+            self.snr[i],
+            self.messages[self.message[i]],
+            self.sources[self.source[i]]
+            )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # returns the index of the new row
+    # rows arriving out of order (e.g. decodes of different instances) are inserted by time
+    def append(self, t, call, grid, band, snr, message='', source=''):
+        row = (
+            t,
+            band,
+            max(-128, min(127, int(snr))),
+            self.calls.intern(call),
+            self.grids.intern(grid),
+            self.messages.intern(message),
+            self.sources.intern(source)
+            )
+        i = len(self.time)
+        if i > self.head and t < self.time[-1]:
+            i = bisect.bisect_right(self.time, t, self.head, i)
+            for column, value in zip(self._columns(), row):
+                column.insert(i, value)
+        else:
+            for column, value in zip(self._columns(), row):
+                column.append(value)
+
+        stats = self.stats.get(call)
+        if stats is None:
+            stats = CallStats()
+            self.stats[call] = stats
+        if len(stats.times) > stats.start and t < stats.times[-1]:
+            stats.times.insert(bisect.bisect_right(stats.times, t, stats.start), t)
+        else:
+            stats.times.append(t)
+        stats.count += 1
+        snr = row[2]
+        stats.snr_sum += snr
+        if stats.first is None or t < stats.first:
+            stats.first = t
+        if stats.last is None or t > stats.last:
+            stats.last = t
+        if stats.snr_min is None or snr < stats.snr_min:
+            stats.snr_min = snr
+        if stats.snr_max is None or snr > stats.snr_max:
+            stats.snr_max = snr
+        return i - self.head
+
+    # rows start..end-1 (all by default) as tuples in the order of the arguments of append()
+    def rows(self, start=0, end=None):
+        end = len(self) if end is None else end
+        for i in range(self.head + start, self.head + end):
+            yield (
+                self.time[i],
+                self.calls[self.call[i]],
+                self.grids[self.grid[i]],
+                self.band[i],
+                self.snr[i],
+                self.messages[self.message[i]],
+                self.sources[self.source[i]]
+                )
+
+    def append_station(self, station):
+        return self.append(station.time, station.call, station.grid, station.band, station.report, station.message, station.source)
+
+    def clear(self):
+        for column in self._columns():
+            del column[:]
+        self.head = 0
+        self.stats.clear()
+        for interner in (self.calls, self.grids, self.messages, self.sources):
+            interner.clear()
+
+    # number of messages of a callsign
+    def count(self, call):
+        stats = self.stats.get(call)
+        return stats.count if stats is not None else 0
+
+    # messages of a callsign, oldest first
+    def messages_of(self, call):
+        stats = self.stats.get(call)
+        if stats is None:
+            return []
+        return [self[i - self.head] for i in self._rows_of(call, stats)]
+
+    # physical indices of the messages of a callsign, oldest first
+    # rows with equal time are told apart by the callsign, the n-th equal time is the n-th matching row
+    def _rows_of(self, call, stats):
+        id = self.calls.get(call)
+        previous = None
+        for t in stats.times[stats.start:]:
+            if t != previous:
+                i = bisect.bisect_left(self.time, t, self.head)
+                previous = t
+            else:
+                i += 1
+            while self.call[i] != id:
+                i += 1
+            yield i
+
+    # index of the first message not older than t (seconds since epoch)
+    def bisect(self, t):
+        return bisect.bisect_left(self.time, t, self.head) - self.head
+
+    # messages since a point in time (seconds since epoch), optionally of a single band
+    def select(self, since=None, band=None):
+        start = self.bisect(since) if since is not None else 0
+        if band is None:
+            return [self[i] for i in range(start, len(self))]
+        bands = self.band
+        head = self.head
+        return [self[i] for i in range(start, len(self)) if bands[head + i] == band]
+
+    # remove all messages older than limit (seconds since epoch), returns number of removed messages
+    def remove_older_than(self, limit):
+        removed = self.bisect(limit)
+        self._expire(self.head, self.head + removed)
+        self.head += removed
+        if self.head > len(self.time) // 2:
+            self._compact()
+        return removed
+
+    # remove rows start..end-1 (physical) from the statistics
+    def _expire(self, start, end):
+        recompute = set()
+        for i in range(start, end):
+            call = self.calls[self.call[i]]
+            stats = self.stats[call]
+            stats.start += 1 # rows expire in order
+            stats.count -= 1
+            if stats.count == 0:
+                del self.stats[call]
+                recompute.discard(call)
+                continue
+            if stats.start > len(stats.times) // 2:
+                del stats.times[:stats.start]
+                stats.start = 0
+            snr = self.snr[i]
+            stats.snr_sum -= snr
+            stats.first = stats.times[stats.start]
+            if snr == stats.snr_min or snr == stats.snr_max:
+                recompute.add(call)
+        for call in recompute: # extremes expired, rescan remaining messages of the call
+            stats = self.stats[call]
+            snrs = [self.snr[i] for i in self._rows_of(call, stats)]
+            stats.snr_min = min(snrs)
+            stats.snr_max = max(snrs)
+
+    # drop expired rows and strings no longer referenced
+    def _compact(self):
+        for column in self._columns():
+            del column[:self.head]
+        self.head = 0
+        for column, interner in ((self.call, self.calls), (self.grid, self.grids), (self.message, self.messages), (self.source, self.sources)):
+            if len(interner) > 2 * len(column):
+                used = Interner()
+                column[:] = array(column.typecode, [used.intern(interner[id]) for id in column])
+                interner.values, interner.ids = used.values, used.ids
@@ -0,0 +1,87 @@
+import math
+import hashlib
+
+from . import constants
+
+# number of distinct values (e.g. callsigns) of a time bin, mergeable with others
+# values are kept in a set up to HLL_SPARSE_LIMIT, beyond that the set is replaced by a
+# HyperLogLog sketch of 2 ** HLL_PRECISION registers (standard error 1.04 / sqrt(registers))
+# exact: always keep the set, for short windows where the exact number is affordable
+# reference: Flajolet et al., HyperLogLog: the analysis of a near-optimal cardinality estimation algorithm
+class Distinct():
+    __slots__ = ('values', 'registers', 'exact')
+
+    def __init__(self, values=(), exact=False):
+        self.values = set()
+        self.registers = None
+        self.exact = exact
+        self.update(values)
+
+    def __len__(self):
+        if self.registers is None:
+            return len(self.values)
+        return _estimate(self.registers)
+
+    def add(self, value):
+        if self.registers is None:
+            self.values.add(value)
+            if not self.exact and len(self.values) > constants.HLL_SPARSE_LIMIT:
+                self._to_sketch()
+        else:
+            _add(self.registers, value)
+
+    # add the values of another Distinct or any iterable
+    def update(self, other):
+        if not isinstance(other, Distinct):
+            for value in other:
+                self.add(value)
+        elif other.registers is None:
+            self.update(other.values)
+        else:
+            if self.registers is None:
+                self._to_sketch() # an exact union is not possible anymore
+            self.registers[:] = bytes(map(max, self.registers, other.registers))
+
+    def _to_sketch(self):
+        self.registers = bytearray(1 << constants.HLL_PRECISION)
+        for value in self.values:
+            _add(self.registers, value)
+        self.values = set()
+
+    # list of values or hex string of the registers
+    def to_json(self):
+        return sorted(self.values) if self.registers is None else self.registers.hex()
+
+    @staticmethod
+    def from_registers(registers):
+        distinct = Distinct()
+        distinct.registers = bytearray(registers)
+        return distinct
+
+    @staticmethod
+    def from_json(o):
+        if isinstance(o, str):
+            return Distinct.from_registers(bytes.fromhex(o))
+        return Distinct(o)
+
+_bits = 64 - constants.HLL_PRECISION
+
+# register index and rank of a value, e.g. to fill many sketches at once
+def position(value):
+    h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little') # stable between runs
+    rest = h & ((1 << _bits) - 1)
+    return h >> _bits, _bits - rest.bit_length() + 1 # rank: position of the first 1 bit
+
+def _add(registers, value):
+    index, rank = position(value)
+    if rank > registers[index]:
+        registers[index] = rank
+
+def _estimate(registers):
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros > 0:
+        estimate = m * math.log(m / zeros) # linear counting for small numbers
+    return int(round(estimate))
@@ -0,0 +1,56 @@
+import os
+import json
+import time
+import logging
+
+from . import constants
+
+logger = logging.getLogger('knowncalls')
+
+# every full callsign decoded and when it was last heard, persisted between runs
+# WSJT-X sends hashed callsigns it could not resolve as <...> without the hash, so a hashed caller
+# can only be resolved from its QSO partner (see Networking._check_message), which must have been heard
+# before the QSO, e.g. calling CQ, possibly in a previous run
+# callsigns not heard for KNOWN_CALL_MAX_AGE days are forgotten when loading
+class KnownCalls():
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.last_heard = {} # callsign -> time last heard
+        self.modified = False
+
+    def __len__(self):
+        return len(self.last_heard)
+
+    def add(self, call, t=None):
+        self.last_heard[call] = t if t is not None else time.time()
+        self.modified = True
+
+    def __contains__(self, call):
+        return call in self.last_heard
+
+    def load(self):
+        if self.filepath is None or not os.path.isfile(self.filepath):
+            return
+        logger.info('loading known callsigns')
+        try:
+            with open(self.filepath, 'r') as file:
+                last_heard = json.load(file)
+            limit = time.time() - constants.KNOWN_CALL_MAX_AGE * 86400
+            self.last_heard = {call: t for call, t in last_heard.items() if t >= limit}
+            self.modified = False
+            logger.info('loaded %d known callsigns from file' % len(self))
+        except Exception as e:
+            logger.error('could not load known callsigns file!')
+            logger.error(e)
+
+    def save(self):
+        if self.filepath is None or not self.modified:
+            return
+        logger.info('saving known callsigns')
+        try:
+            with open(self.filepath, 'w') as file:
+                json.dump(self.last_heard, file, indent=1)
+            self.modified = False
+        except Exception as e:
+            logger.error('could not save known callsigns file!')
+            logger.error(e)
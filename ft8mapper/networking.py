@@ -1,16 +1,77 @@
+import sys
 import time
+import struct
+import asyncio
 import logging
 import socket
+import selectors
 import threading
+from functools import partial
 
+from . import capture
+from . import decoder
+from . import knowncalls
+from . import tokenizer
 from . import constants
 
 logger = logging.getLogger('net')
 
+# state of a single WSJT-X instance, identified by the id sent with every packet
+class Client():
+    def __init__(self, id):
+        self.id = id
+        self.freq = None   # last known dial frequency
+        self.mode = None   # last known mode, e.g. FT8
+        self.de_call = None
+        self.de_grid = None
+        self.decoding = False
+        self.tdstamp = time.time() # on-air time of current batch of decodes
+        self.otmi = -1             # old time tracker
+        self.batch = []            # decodes of the current T/R cycle not yet delivered
+        self.partners = {}         # callsign -> (callsign of its last QSO partner, time, partner known before the QSO), to resolve <...>
+        self.last_decode = 0.0     # time of last decode added to batch
+
+# create a bound UDP socket
+#   group: join this multicast group (IPv4), e.g. '239.255.0.1'
+#   interface: ip address of the interface used for the multicast group, empty for any
+#   reuse: allow other applications (e.g. GridTracker, JTAlert) to bind the same port
+# note: only multicast datagrams are delivered to every socket sharing a port,
+#       unicast datagrams go to a single one of them
+def open_socket(host, port, group='', interface='', reuse=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        if reuse or group:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, 'SO_REUSEPORT'): # not available on windows
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        if group:
+            # windows cannot bind to a multicast address, other systems use it to filter other groups
+            sock.bind(('' if sys.platform == 'win32' else group, port))
+            membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface or '0.0.0.0'))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            sock.bind((host, port))
+    except OSError as e:
+        sock.close()
+        logger.error(e)
+        raise Exception('could not bind to %s:%s!' % (group or host, port))
+    return sock
+
 class Networking():
-    def __init__(self, host, port, on_message=None, on_band_changed=None, on_receiver_location=None):
+    # endpoints: additional sockets to listen on, each a dictionary with
+    #            'host', 'port' and optionally 'multicast', 'interface' and 'reuse'
+    # on_decodes receives all decodes of a T/R cycle at once, otherwise on_message is called for each decode
+    # recorder (capture.Recorder) writes every received datagram to a capture file
+    # known_calls (knowncalls.KnownCalls) collects every full callsign to resolve hashed callsigns
+    def __init__(self, host, port, on_message=None, on_band_changed=None, on_receiver_location=None, multicast='', interface='', reuse=False, endpoints=None, on_decodes=None, recorder=None, known_calls=None):
         self.host = host
         self.port = port
+        self.on_decodes = on_decodes
+        self.recorder = recorder
+        self.clock = time.time # source of current time, replaced when replaying captures
+        self.endpoints = [{'host': host, 'port': port, 'multicast': multicast, 'interface': interface, 'reuse': reuse}]
+        self.endpoints += list(endpoints if endpoints is not None else [])
         self.on_message = on_message
         self.on_band_changed = on_band_changed
         self.on_receiver_location = on_receiver_location
@@ -22,10 +83,11 @@ class Networking():
         self.heartbeat += b'\x00\x00\x00\x02'                  # max schema version
         self.heartbeat += b'\x00\x00\x00\x00\x00\x00\x00\x00'  # sw release revs (0's)
         
-        self.ofreq = None # last known receive frequency
+        self.clients = {} # state per WSJT-X instance, keyed by client id
+        self.tokenizer = tokenizer.Tokenizer()
+        self.known_calls = known_calls if known_calls is not None else knowncalls.KnownCalls()
+        self.hashes_resolved = 0
         self.tm0 = time.time()                             # grab time for heartbeat tracking
-        self.tdstamp = time.time()                         # get timestamp used for tracking decode
-        self.otmi = -1                                     # initialize old time tracker
 
     def start(self):
         logger.info('starting network client')
@@ -37,209 +99,341 @@ class Networking():
         if self.network_thread.is_alive():
             logger.info('stopping network client')
             self.running = False
-            while self.network_thread.is_alive():
-                logger.debug('waking up network loop...')
-                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-                    sock.sendto(bytearray(0), (self.host, self.port)) # unblock network thread
-                self.network_thread.join(timeout=1.0)
+            self.network_thread.join() # network loop polls running flag
             logger.debug('network client is now stopped')
+            self._log_statistics()
+
+    def _log_statistics(self):
+        self.tokenizer.log_statistics()
+        logger.info('resolved %d hashed callsigns, %d callsigns known' % (self.hashes_resolved, len(self.known_calls)))
+
+    def _open_sockets(self):
+        sockets = []
+        try:
+            for endpoint in self.endpoints:
+                sockets.append(open_socket(
+                    endpoint['host'],
+                    endpoint['port'],
+                    group=endpoint.get('multicast', ''),
+                    interface=endpoint.get('interface', ''),
+                    reuse=endpoint.get('reuse', False)
+                    ))
+                logger.info('listening on %s:%s' % (endpoint.get('multicast') or endpoint['host'], endpoint['port']))
+        except:
+            for sock in sockets:
+                sock.close()
+            raise
+        return sockets
 
     # protocol reference
     # https://sourceforge.net/p/wsjt/wsjtx/ci/master/tree/Network/NetworkMessage.hpp
 
-    def _check_frequency(self, freq):
-        if freq != self.ofreq:                    # if new freq doesn't equal old
+    def _client(self, id):
+        client = self.clients.get(id)
+        if client is None:
+            logger.info('new WSJT-X instance "%s"' % id)
+            client = Client(id)
+            self.clients[id] = client
+        return client
+
+    # deliver decodes collected for a client
+    def _flush(self, client):
+        if len(client.batch) == 0:
+            return
+        batch = client.batch
+        client.batch = []
+        limit = self.clock() - constants.QSO_TIMEOUT
+        client.partners = {call: partner for call, partner in client.partners.items() if partner[1] >= limit}
+        if self.on_decodes is not None:
+            self.on_decodes(batch, client.tdstamp, client.id)
+        elif self.on_message is not None:
+            for caller, grid, snr, rtext in batch:
+                self.on_message(caller, grid, snr, rtext, client.id)
+
+    # deliver all pending decodes, called by the network engines when they stop,
+    # so decodes of the current T/R cycle are not lost
+    def _flush_all(self):
+        for client in self.clients.values():
+            self._flush(client)
+
+    # deliver batches that did not receive decodes for a while
+    # called regularly by the network engines
+    def _flush_idle(self):
+        now = self.clock()
+        for client in self.clients.values():
+            if len(client.batch) > 0 and now - client.last_decode > constants.DECODE_BATCH_TIMEOUT:
+                self._flush(client)
+
+    def _check_frequency(self, client, freq):
+        if freq != client.freq:                    # if new freq doesn't equal old
+            self._flush(client)                    # decodes belong to the old band
             if self.on_band_changed is not None and self.running:
-                self.on_band_changed(freq)
-            self.ofreq = freq                 # old freq becomes new freq
+                self.on_band_changed(freq, client.id)
+            client.freq = freq                 # old freq becomes new freq
     
-    def _check_message(self, mesg):
-        cq = 0                            # flag indicates whether CQ, 73 or QSO
-        caller = ''                       # callsign of 1 callsign mesg
-        called = ''                       # holds 2nd callsign if 2 callsign QSO mesg
-        grid = ''                         # holds grid
-        ota = ''                          # 'on the air' - holds stuff like 'POTA' or 'DX'
-
-        smesg = mesg.decode('utf-8')      # decode from byte to string
-        rtext = smesg
-        msglist = smesg.split()           # split by whitespace
-        nitem = len(msglist)              # how many items came out of split?
-
-        if msglist[0] == 'CQ':          # 'cq caller grid'
-            cq = 1                        # mark as a CQ
-            if any(char.isdigit() for char in msglist[1]):
-                if nitem > 1:
-                    caller = msglist[1]   # get the callsign
-                if nitem > 2:
-                    grid = msglist[2]     # get the grid
-            else:                       # 'cq dx/ota call1 grid'
-                ota = msglist[1]          # grab dx, pota, vota, etc.
-                if nitem > 2:
-                    caller = msglist[2]   # get the callsing
-                    caller += '/' + ota   # append ota suffix
-                if nitem > 3:
-                    grid = msglist[3]     # get the grid
-            caller = caller.replace('<', '')
-            caller = caller.replace('>', '')
-            if len(caller) < 3 or caller == 'RR73': # malformed
-                raise Exception('caller is malformed')
-        else:                           # 'called caller snr/grid/rr73'
-            if any(char.isdigit() for char in msglist[0]):
-                called = msglist[0]        # grab 1st callsign
-                called = called.replace('<', '')
-                called = called.replace('>', '')
-            if nitem > 1:
-                if any(char.isdigit() for char in msglist[1]):
-                    caller = msglist[1]    # grab 2nd callsign
-                    caller = caller.replace('<', '')
-                    caller = caller.replace('>', '')
-                    if len(caller) < 3 or caller == 'RR73': # malformed
-                        raise Exception('caller is malformed')
-            if nitem > 2:
-                if msglist[2].isalnum():    # kill R-23 and -10 stuff
-                    if msglist[2] == '73' or msglist[2] == 'RR73':
-                        cq = 2            # 73 as RR73 isn't a valid grid
-                    else:
-                        if any(char.isdigit() for char in msglist[2]):
-                            if len(msglist[2]) == 4:  # 4 chars long & no punct
-                                grid = msglist[2]     # assume grid
-        if caller == '' or caller[0 : 4] == 'RR73':  # caller is blank, trash...
-            raise Exception('caller is blank')
-
-        #if self.sband == constants.unknown_band:          # before plotting we have to know the band
-        #    return True
-
-        if len(grid) < 4:   # garbage grid... usually 'a7' or '73' due to misformatted QSO
-            raise Exception('grid is garbage')
-        if len(grid) > 4:   # if length of grid > 4
-            grid = grid[:4]   # truncate to 4 chars
-
-        return caller, grid, rtext
-
-    def _pkttype0(self, addr):
-        self.sock.sendto(self.heartbeat, addr) # respond with heartbeat
+    # the partner is known before the QSO if it was heard (in this or a previous run, see knowncalls)
+    # before the first message between the two stations
+    def _remember_partner(self, client, call, partner, t):
+        previous = client.partners.get(call)
+        if previous is not None and previous[0] == partner:
+            known = previous[2] # same QSO
+        else:
+            known = partner in self.known_calls
+        client.partners[call] = (partner, t, known)
+
+    # returns (caller, grid, message text) or None if the message does not name a caller, grid may be empty
+    def _check_message(self, mesg, client):
+        message, reason = self.tokenizer.parse(mesg)
+        now = self.clock()
+        if message.caller != '' and message.called != '': # remember QSO partners, before they become known
+            self._remember_partner(client, message.called, message.caller, now)
+            self._remember_partner(client, message.caller, message.called, now)
+        if message.caller != '':
+            self.known_calls.add(message.caller, now)
+        if message.called != '':
+            self.known_calls.add(message.called, now)
+
+        if reason == tokenizer.R_HASHED and message.called != '':
+            # WSJT-X could not resolve the hash of the caller, which is usually the station
+            # the called station is working, e.g. after 'CQ PJ4/K1ABC' and '<PJ4/K1ABC> W9XYZ'
+            # a partner only heard in this QSO may be a false decode, so it must have been known before
+            partner, t, known = client.partners.get(message.called, (None, 0, False))
+            if partner is not None and now - t < constants.QSO_TIMEOUT and known:
+                message = message._replace(caller=partner)
+                reason = tokenizer.R_GRID if message.grid == '' else None
+                self.hashes_resolved += 1
+
+        if reason is not None and reason != tokenizer.R_GRID:
+            return None # messages without grid are located by the store, if the caller is known
+        caller = message.caller
+        if message.ota != '':
+            caller += '/' + message.ota # e.g. CQ POTA, keep activations apart from home station
+        return caller, message.grid, message.text
+
+    def _pkttype0(self, sendto, addr):
+        sendto(self.heartbeat, addr) # respond with heartbeat
         return True
 
-    def _pkttype1(self, data):
-        offset = 0
-        self.nfreq = int.from_bytes(data[offset : offset + 8], 'big')
-        self._check_frequency(self.nfreq)
-        offset += 8
-
-        # skip Mode, DX call, Report, Tx mode
-        for i in range(4):
-            size = int.from_bytes(data[offset : offset + 4], 'big')
-            offset += 4 + (size if size != 0xFFFFFFFF else 0)
-
-        # skip TX Enabled, Transmitting, Decoding
-        offset += 3
-
-        # skip Rx DF, Tx DF
-        offset += 8
-
-        # get DE call
-        size = int.from_bytes(data[offset : offset + 4], 'big')
-        offset += 4
-        if size > 0:
-            de_call = data[offset : offset + size].decode('utf-8')
-        else: # no callsign
-            de_call = '-'
-        offset += (size if size != 0xFFFFFFFF else 0)
-
-        # get DE grid
-        size = int.from_bytes(data[offset : offset + 4], 'big')
-        offset += 4
-        if size > 0:
-            de_grid = data[offset : offset + size].decode('utf-8')
-            de_grid = de_grid[:4]
+    def _pkttype1(self, status):
+        client = self._client(status.id)
+        self._check_frequency(client, status.frequency)
+        client.mode = status.mode
+        if client.decoding and not status.decoding: # decoder finished
+            self._flush(client)
+        client.decoding = status.decoding
+
+        # get DE call and grid
+        client.de_call = status.de_call if len(status.de_call) > 0 else '-' # no callsign
+        if len(status.de_grid) > 0:
+            client.de_grid = status.de_grid[:4]
 
             if self.on_receiver_location is not None and self.running:
-                self.on_receiver_location(de_call, de_grid)
-        offset += (size if size != 0xFFFFFFFF else 0)
+                self.on_receiver_location(client.de_call, client.de_grid, client.id)
 
         return True
 
-    def _pkttype2(self, data):
+    def _pkttype2(self, decode):
         # inside a DECODE packet
-        offset = 0
-        if bool.from_bytes(data[offset : offset + 1], 'big') is False: # New?
-            return True                        # just a replay pkt, ignore...
-        offset += 1                          # step 1 byte past new flag
-        qtime = data[offset : offset + 4]       # get 4 byte time since midnite
-        offset += 4                          # step past those 4
-        tmi = int.from_bytes(qtime, 'big') / 1000 # grab time from pkt
-        if tmi != self.otmi:                       # new batch of decodes starting
-            self.tdstamp = int(time.time())        # grab realtime timestamp
-            self.otmi = tmi                        # set to avoid re-fire till new batch
-        snr = int.from_bytes(data[offset : offset + 4], 'big', signed=True)
-        offset += 4                          # step past those 4
-        deltat = data[offset : offset + 8]      # 8 byte time delta value
-        offset += 8                          # step past those 8
-        deltaf = data[offset : offset + 4]      # grab freq of remote station
-        offset += 4                          # step past those 4
-        # grab 4 byte length of mode field converting to integer
-        modelenval = int.from_bytes(data[offset : offset + 4], 'big')
-        offset += 4                          # step past those 4
-        # use length of mode field to grab the whole thing
-        mode = data[offset : offset + modelenval]
-        offset += modelenval                 # step past by length of mode field
-        # grab 4 byte length of message field converting to integer
-        mesglenval = int.from_bytes(data[offset : offset + 4], 'big')
-        offset += 4                          # step past those 4
-        # use length of mesg field to grab the whole thing
-        mesg = data[offset : offset + mesglenval]
-        # offset+=mesglenval               # step past the mesg field
+        if not decode.new:                       # New?
+            return True                          # just a replay pkt, ignore...
+        client = self._client(decode.id)
+        if decode.time != client.otmi:               # new batch of decodes starting
+            self._flush(client)                      # deliver previous batch
+            now = self.clock()
+            client.tdstamp = decoder.qtime_to_epoch(decode.time, now) if decode.time is not None else now # on-air time of T/R cycle
+            client.otmi = decode.time                # set to avoid re-fire till new batch
 
         if time.time() - self.tm0 <= 6:            # we can still get late decodes
             self.tm0 = time.time()                 # if deep decode is set...
 
-        try:
-            caller, grid, rtext = self._check_message(mesg)
-        except:
+        station = self._check_message(decode.message, client)
+        if station is None:
             return False
 
-        if self.on_message is not None and self.running:
-            self.on_message(caller, grid, snr, rtext)
+        caller, grid, rtext = station
+        client.batch.append((caller, grid, decode.snr, rtext))
+        client.last_decode = self.clock()
+
+        return True
+
+    # handle a single datagram, shared by all network engines
+    # sendto is used to respond to the sender (e.g. socket.sendto or transport.sendto)
+    def _handle_datagram(self, data, addr, sendto):
+        if self.recorder is not None:
+            self.recorder.write(data, self.clock())
 
+        # WSJT-X gave us a packet to inspect
+        try:
+            pkttype, record = decoder.decode(data)
+        except ValueError as e:
+            logger.warning('dropping malformed packet from %s:%s (%s)' % (addr[0], addr[1], e))
+            return False
+
+        # handle packets based on type
+        if pkttype == decoder.HEARTBEAT:
+            self._pkttype0(sendto, addr)
+        elif pkttype == decoder.DECODE:             # if not decode packet restart loop
+            _ = self._pkttype2(record)
+        elif pkttype == decoder.STATUS:             # packet type 1 - grab frequency
+            _ = self._pkttype1(record)
+        elif pkttype == decoder.CLOSE:              # WSJT-X is shutting down
+            if record.id in self.clients:
+                self._flush(self.clients.pop(record.id)) # forget its state, but leave the window open
+        elif record is not None:
+            pass # known packet type, but nothing to do for us
+        else:
+            logger.warning('unhandled pkttype %d received.' % pkttype)
         return True
 
     def _recv_loop(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as self.sock:     # UDP datagrams
+        sockets = self._open_sockets()
+        with selectors.DefaultSelector() as selector:
+            for sock in sockets:
+                selector.register(sock, selectors.EVENT_READ)
+
+            logger.info('entering network loop...')
             try:
-                self.sock.bind((self.host, self.port))             # bind to port
-            except:
+                while self.running:
+                    for key, _ in selector.select(timeout=0.5): # wake up regularly to check running flag
+                        sock = key.fileobj
+                        data, addr = sock.recvfrom(2048)    # data for us?
+
+                        if not self.running:
+                            break
+
+                        self._handle_datagram(data, addr, sock.sendto)
+                    self._flush_idle()
+            except Exception as e:
                 logger.error('caught network error')
-                raise Exception('could not bind to %s:%s!' % (self.host, self.port))
+                self.running = False
+                raise e # rethrow exception
+            finally:
+                for sock in sockets:
+                    sock.close()
+                self._flush_all()
+        logger.info('network loop is terminated')
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, network):
+        self.network = network
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.network.running:
+            self.network._handle_datagram(data, addr, self.transport.sendto)
+
+    def error_received(self, exc):
+        logger.error('caught network error')
+        logger.error(exc)
+
+# same callbacks as Networking, but all endpoints are served by a single asyncio event loop
+# stopping cancels the serving task, so there is no need to poll or wake up blocking sockets
+class AsyncNetworking(Networking):
+    def start(self):
+        logger.info('starting asyncio network client')
+        self.running = True
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(self._serve())
+        self.network_thread = threading.Thread(name='Network', target=self._run_loop)
+        self.network_thread.start()
+
+    def stop(self):
+        if self.network_thread.is_alive():
+            logger.info('stopping network client')
+            self.running = False
+            self.loop.call_soon_threadsafe(self.task.cancel)
+            self.network_thread.join()
+            logger.debug('network client is now stopped')
+            self._log_statistics()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error('caught network error')
+            self.running = False
+            raise e # rethrow exception
+        finally:
+            self.loop.close()
+        logger.info('network loop is terminated')
+
+    async def _serve(self):
+        sockets = self._open_sockets()
+        transports = []
+        try:
+            for sock in sockets:
+                transport, _ = await self.loop.create_datagram_endpoint(
+                    partial(_DatagramProtocol, self),
+                    sock=sock
+                    )
+                transports.append(transport)
 
             logger.info('entering network loop...')
-            while self.running:
-                try:
-                    data, addr = self.sock.recvfrom(2048)    # data for us?
-
-                    if not self.running:
-                        break
-
-                    # WSJT-X gave us a packet to inspect
-                    pkttype = int.from_bytes(data[8 : 12], 'big')
-                    idlen = int.from_bytes(data[12 : 16], 'big')
-                    offset = 16  # set offset past magic#, schema, pkttype and idlen
-                    swid = data[offset : offset + idlen]    # use idlen to grab full swid
-                    offset += idlen  # adjust offset by length of software ID (swid)
-
-                    # handle packets based on type
-                    payload = data[offset:]
-                    if pkttype == 0:
-                        self._pkttype0(addr)
-                    elif pkttype == 2:  # if not decode packet restart loop
-                        _ = self._pkttype2(payload)
-                    elif pkttype == 1:                          # packet type 1 - grab frequency
-                        _ = self._pkttype1(payload)
-                    elif pkttype == 6:                          # WSJT-X is shutting down
-                        pass # ignore it and leave the window open
-                    else:
-                        logger.warning('unhandled pkttype %d received.' % pkttype)
-                except Exception as e:
-                    logger.error('caught network error')
-                    self.running = False
-                    raise e # rethrow exception
-        logger.info('network loop is terminated')
\ No newline at end of file
+            while True: # serve until cancelled
+                await asyncio.sleep(constants.DECODE_BATCH_TIMEOUT / 2)
+                self._flush_idle()
+        finally:
+            for transport in transports:
+                transport.close()
+            for sock in sockets[len(transports):]: # not owned by a transport yet
+                sock.close()
+            self._flush_all()
+
+# feeds datagrams of a capture file (see capture.py) through the same decode path
+#   speed: 1.0 replays in real time, N replays N times faster, 0 replays as fast as possible
+# messages keep the time of the capture, on_finished is called after the last datagram
+class ReplayNetworking(Networking):
+    def __init__(self, filepath, speed=1.0, on_finished=None, **kwargs):
+        super().__init__('', 0, **kwargs)
+        self.filepath = filepath
+        self.speed = speed
+        self.on_finished = on_finished
+        self.replay_time = time.time()
+        self.clock = lambda: self.replay_time
+        self.stopped = threading.Event()
+
+    def start(self):
+        logger.info('replaying %s at %s speed' % (self.filepath, ('x%g' % self.speed) if self.speed > 0 else 'maximum'))
+        self.running = True
+        self.stopped.clear()
+        self.network_thread = threading.Thread(name='Network', target=self._replay_loop)
+        self.network_thread.start()
+
+    def stop(self):
+        if self.network_thread.is_alive():
+            logger.info('stopping replay')
+            self.running = False
+            self.stopped.set()
+            self.network_thread.join()
+
+    def _replay_loop(self):
+        count = 0
+        first = None
+        start = time.monotonic()
+        for t, data in capture.read(self.filepath):
+            if first is None:
+                first = t
+            if self.speed > 0:
+                delay = (t - first) / self.speed - (time.monotonic() - start)
+                if delay > 0 and self.stopped.wait(delay):
+                    break # stopped while waiting
+            if not self.running:
+                break
+
+            self.replay_time = t
+            self._handle_datagram(data, ('replay', 0), lambda *_: None) # nobody to respond to
+            self._flush_idle()
+            count += 1
+
+        self._flush_all() # deliver remaining decodes, also when stopped early
+        duration = time.monotonic() - start
+        self._log_statistics()
+        logger.info('replayed %d datagrams in %.1f seconds (%.0f datagrams/s)' % (count, duration, count / max(duration, 1.0e-6)))
+        if self.on_finished is not None and self.running:
+            self.on_finished()
@@ -0,0 +1,504 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from . import rollup
+from . import _station
+from . import constants
+
+logger = logging.getLogger('persistence')
+
+# storage backends of the store, selected by config['storage']
+#   read_stations(): last message per band and call, {band: {call: Station}}
+#   read_rollups(): rollup.Rollups of expired messages
+#   read_messages(since, until): generator of rows (see MessageHistory.append) of a time range, oldest first,
+#       self.progress tells the fraction read so far, reading may happen in another thread (see Store.start_loading)
+#   add(station): a message was stored
+#   commit(): end of a batch of messages, i.e. a decode cycle
+#   expire(store, limit): messages older than limit (seconds since epoch) are no longer needed,
+#       store.rollups must be persisted before any of them is deleted, they cannot be rolled up again
+#   save(store): persist everything, e.g. on exit
+#   clear(): remove all persisted messages and rollups
+#   close()
+
+# nothing is read or written, used when the store does not persist, e.g. for example stations
+class NullBackend():
+    partial = False
+    progress = 1.0
+
+    def read_stations(self):
+        return {str(band): {} for _, _, band, _ in constants.band_list}
+
+    def read_rollups(self):
+        return rollup.Rollups()
+
+    def read_messages(self, since=None, until=None):
+        return iter(())
+
+    def add(self, station):
+        pass
+
+    def commit(self):
+        pass
+
+    def expire(self, store, limit):
+        pass
+
+    def clear(self):
+        pass
+
+    def save(self, store):
+        pass
+
+    def close(self):
+        pass
+
+# the whole data is written to stations.json and messages.json on save
+class JsonBackend():
+    partial = False # always loads the full history
+
+    def __init__(self, configdir):
+        self.stations_filepath = os.path.join(configdir, 'stations.json')
+        self.messages_filepath = os.path.join(configdir, 'messages.json')
+        self.rollups_filepath = os.path.join(configdir, 'rollups.json')
+        self.progress = 0.0
+
+    def exists(self):
+        return os.path.isfile(self.stations_filepath) or os.path.isfile(self.messages_filepath)
+
+    def read_stations(self):
+        stations = {str(band): {} for _, _, band, _ in constants.band_list}
+        logger.info('loading stations file')
+        try:
+            if os.path.isfile(self.stations_filepath):
+                with open(self.stations_filepath, 'r') as file:
+                    stations.update(json.load(file, object_hook=_station.from_json))
+                logger.info('loaded %d stations from file' % (sum(len(stations[band]) for band in stations)))
+        except Exception as e:
+            logger.error('could not load stations file!')
+            logger.error(e)
+        return stations
+
+    def read_rollups(self):
+        rollups = rollup.Rollups()
+        rollups.load(self.rollups_filepath)
+        return rollups
+
+    # the file is parsed as a whole, progress only moves while the messages are handed out
+    def read_messages(self, since=None, until=None):
+        self.progress = 0.0
+        if not os.path.isfile(self.messages_filepath):
+            self.progress = 1.0
+            return
+        logger.info('loading messages file')
+        with open(self.messages_filepath, 'r') as file:
+            messages = json.load(file, object_hook=_station.from_json)
+        messages = [m for m in messages if (since is None or m.time >= since) and (until is None or m.time < until)]
+        messages.sort(key=lambda m: m.time) # usually sorted already
+        for i, m in enumerate(messages):
+            if i % 1000 == 0:
+                self.progress = i / len(messages)
+            yield (m.time, m.call, m.grid, m.band, m.report, m.message, m.source)
+        self.progress = 1.0
+        logger.info('loaded %d messages from file' % len(messages))
+
+    def add(self, station):
+        pass
+
+    def commit(self):
+        pass
+
+    def expire(self, store, limit):
+        pass # messages.json keeps expired messages until the next save
+
+    def clear(self):
+        pass # files are overwritten on save
+
+    # rollups first, so a crash in between cannot lose rolled up messages
+    def save(self, store):
+        store.rollups.save(self.rollups_filepath)
+        self.save_stations(store.station_data)
+        self.save_messages(store.message_data)
+
+    def save_stations(self, station_data):
+        logger.info('saving stations file')
+        try:
+            with open(self.stations_filepath, 'w') as file:
+                json.dump(station_data, file, cls=_station.Serializer, indent=1)
+        except Exception as e:
+            logger.error('could not save stations file!')
+            logger.error(e)
+
+    def save_messages(self, message_data):
+        logger.info('saving messages file')
+        try:
+            with open(self.messages_filepath, 'w') as file:
+                json.dump(list(message_data), file, cls=_station.Serializer, indent=1)
+        except Exception as e:
+            logger.error('could not save messages file!')
+            logger.error(e)
+
+    def close(self):
+        pass
+
+# messages are inserted into an SQLite database (messages.db) once per decode cycle
+# stations are the last message per band and call, so they are not stored separately
+# rollups are kept in the same database, updated in the transaction that deletes the expired messages
+# only messages of the active window are loaded, older ones on demand (see Store.ensure_loaded)
+class SQLiteBackend():
+    partial = True
+
+    def __init__(self, configdir):
+        self.filepath = os.path.join(configdir, 'messages.db')
+        self.configdir = configdir
+        self.pending = [] # messages not inserted yet
+        self.progress = 0.0
+        self.lock = threading.Lock() # protects the connection, commits and expiry may happen in different threads
+        create = not os.path.isfile(self.filepath)
+        self.db = sqlite3.connect(self.filepath, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL') # durable at checkpoints, consistent at any time
+        self.db.execute('''CREATE TABLE IF NOT EXISTS messages (
+            time REAL NOT NULL,
+            call TEXT NOT NULL,
+            grid TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            report INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            source TEXT NOT NULL
+            )''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS messages_time ON messages (time)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS messages_call ON messages (call, time)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS messages_grid ON messages (grid, time)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS messages_band ON messages (band, call, time)')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS rollups (
+            hour INTEGER NOT NULL,
+            band INTEGER NOT NULL,
+            grid TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            snr_min INTEGER NOT NULL,
+            snr_max INTEGER NOT NULL,
+            snr_sum INTEGER NOT NULL,
+            calls TEXT NOT NULL,
+            snrs TEXT NOT NULL,
+            PRIMARY KEY (hour, band, grid)
+            )''')
+        self.db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)') # e.g. rollups_until
+        self.db.commit()
+        if create:
+            self._import_json()
+
+    # take over data of the json backend once
+    def _import_json(self):
+        previous = JsonBackend(self.configdir)
+        if not previous.exists():
+            return
+        logger.info('importing messages from json files')
+        try:
+            self.pending.extend(previous.read_messages())
+            count = len(self.pending)
+            self.commit()
+            rollups = previous.read_rollups()
+            rollups.changed = set(rollups.hours)
+            with self.lock:
+                with self.db:
+                    self._write_rollups(rollups)
+            logger.info('imported %d messages and %d rollups' % (count, len(rollups)))
+        except Exception as e:
+            logger.error('could not import messages from json files!')
+            logger.error(e)
+
+    def read_stations(self):
+        logger.info('loading stations from database')
+        with self.lock:
+            # last message per band and call, stations are expired like messages
+            rows = self.db.execute('''SELECT max(time), call, grid, band, report, message, source
+                FROM messages WHERE time >= ? GROUP BY band, call''', (time.time() - constants.MAX_MESSAGE_AGE,)).fetchall()
+        stations = {str(band): {} for _, _, band, _ in constants.band_list}
+        for row in rows:
+            station = _station.Station(*row)
+            stations.setdefault(str(station.band), {})[station.call] = station
+        logger.info('loaded %d stations from database' % len(rows))
+        return stations
+
+    def read_rollups(self):
+        logger.info('loading rollups from database')
+        rollups = rollup.Rollups()
+        with self.lock:
+            row = self.db.execute("SELECT value FROM state WHERE key = 'rollups_until'").fetchone()
+            rows = self.db.execute('SELECT * FROM rollups ORDER BY hour').fetchall()
+        rollups.until = row[0] if row is not None else None
+        rollups.add_rows([*row[:7], json.loads(row[7]), json.loads(row[8])] for row in rows)
+        logger.info('loaded %d rollups of %d hours from database' % (len(rollups), len(rollups.hours)))
+        return rollups
+
+    # buckets of hours rolled up since the last write and the watermark, within a transaction of the caller
+    def _write_rollups(self, rollups):
+        hours = rollups.take_changed()
+        self.db.executemany('INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            [*row[:7], json.dumps(row[7]), json.dumps(row[8])] for row in rollups.rows(hours)
+            ))
+        self.db.execute('DELETE FROM rollups WHERE hour + ? <= ?', (rollup.HOUR, time.time() - constants.ROLLUP_MAX_AGE * 86400))
+        self.db.execute("INSERT OR REPLACE INTO state VALUES ('rollups_until', ?)", (rollups.until,))
+        rollups.modified = False
+
+    # reads through a connection of its own, so inserts of the main connection are not blocked (WAL)
+    def read_messages(self, since=None, until=None):
+        self.progress = 0.0
+        logger.info('loading messages from database')
+        db = sqlite3.connect(self.filepath)
+        try:
+            limits = (since if since is not None else 0.0, until if until is not None else float('inf'))
+            total = db.execute('SELECT count(*) FROM messages WHERE time >= ? AND time < ?', limits).fetchone()[0]
+            cursor = db.execute('SELECT time, call, grid, band, report, message, source FROM messages WHERE time >= ? AND time < ? ORDER BY time', limits)
+            count = 0
+            while True:
+                rows = cursor.fetchmany(constants.LOAD_CHUNK_SIZE)
+                if len(rows) == 0:
+                    break
+                yield from rows
+                count += len(rows)
+                self.progress = count / max(total, 1)
+        finally:
+            db.close()
+        self.progress = 1.0
+        logger.info('loaded %d messages from database' % count)
+
+    def add(self, station):
+        self.pending.append((station.time, station.call, station.grid, station.band, station.report, station.message, station.source))
+
+    def commit(self):
+        if len(self.pending) == 0:
+            return
+        pending = self.pending
+        self.pending = []
+        with self.lock:
+            with self.db: # one transaction per batch
+                self.db.executemany('INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)', pending)
+
+    def expire(self, store, limit):
+        with self.lock:
+            with self.db: # rollups and deletion in one transaction
+                self._write_rollups(store.rollups)
+                removed = self.db.execute('DELETE FROM messages WHERE time < ?', (limit,)).rowcount
+        if removed > 0:
+            logger.info('deleted %d messages from database' % removed)
+
+    def clear(self):
+        self.pending.clear()
+        with self.lock:
+            with self.db:
+                self.db.execute('DELETE FROM messages')
+                self.db.execute('DELETE FROM rollups')
+                self.db.execute('DELETE FROM state')
+
+    def save(self, store):
+        self.commit()
+        with self.lock:
+            with self.db:
+                self._write_rollups(store.rollups)
+
+    def close(self):
+        self.commit()
+        with self.lock:
+            self.db.close()
+
+# messages are appended to a journal (messages.journal), one json array per line:
+#   [time, call, grid, band, report, message, source]
+# a background compaction rewrites stations.json and drops expired messages from the journal,
+# so neither file has to be written as a whole on exit, rollups.json is written before any message is dropped
+class JournalBackend():
+    partial = False
+
+    def __init__(self, configdir):
+        self.filepath = os.path.join(configdir, 'messages.journal')
+        self.configdir = configdir
+        self.stations = JsonBackend(configdir) # stations.json is kept as snapshot
+        self.pending = [] # lines not written yet
+        self.lines = 0 # number of lines in the journal
+        self.progress = 0.0
+        self.lock = threading.Lock() # protects the journal file against compaction
+        self.compaction = None # compaction thread
+        if not os.path.isfile(self.filepath):
+            self._import_json()
+        else:
+            self._truncate_incomplete_line()
+        self.file = open(self.filepath, 'a', encoding='utf-8')
+
+    # drop an incomplete last line, e.g. after a crash while writing,
+    # otherwise the next line would be appended to it and be lost as well
+    def _truncate_incomplete_line(self):
+        with open(self.filepath, 'rb+') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                file.seek(start)
+                block = file.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                logger.warning('removing incomplete last line of journal')
+                file.truncate(position)
+
+    # take over data of the json backend once
+    def _import_json(self):
+        previous = JsonBackend(self.configdir)
+        if not os.path.isfile(previous.messages_filepath):
+            return
+        logger.info('importing messages from json file')
+        try:
+            count = 0
+            with open(self.filepath + '.tmp', 'w', encoding='utf-8') as file:
+                for row in previous.read_messages():
+                    file.write(self._line(*row))
+                    count += 1
+            os.replace(self.filepath + '.tmp', self.filepath)
+            logger.info('imported %d messages' % count)
+        except Exception as e:
+            logger.error('could not import messages from json file!')
+            logger.error(e)
+
+    @staticmethod
+    def _line(*row):
+        return json.dumps(row, separators=(',', ':')) + '\n'
+
+    # the snapshot may be older than the journal, the store updates stations from newer messages
+    def read_stations(self):
+        return self.stations.read_stations()
+
+    def read_rollups(self):
+        return self.stations.read_rollups() # rollups.json, like the json backend
+
+    # read line by line, progress by position in the file
+    def read_messages(self, since=None, until=None):
+        self.progress = 0.0
+        logger.info('loading messages from journal')
+        with self.lock:
+            self.file.flush()
+            size = os.path.getsize(self.filepath)
+        lines = count = position = 0
+        with open(self.filepath, 'rb') as file:
+            for line in file:
+                lines += 1
+                position += len(line)
+                if lines % 1000 == 0:
+                    self.progress = min(position / max(size, 1), 1.0)
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    logger.warning('skipping corrupted line in journal') # e.g. incomplete last line after crash
+                    continue
+                if (since is None or row[0] >= since) and (until is None or row[0] < until):
+                    count += 1
+                    yield row
+        if since is None and until is None:
+            self.lines = lines
+        self.progress = 1.0
+        logger.info('loaded %d messages from journal' % count)
+
+    def add(self, station):
+        self.pending.append(self._line(station.time, station.call, station.grid, station.band, station.report, station.message, station.source))
+
+    def commit(self):
+        if len(self.pending) == 0:
+            return
+        pending = self.pending
+        self.pending = []
+        with self.lock:
+            self.file.write(''.join(pending))
+            self.file.flush()
+            self.lines += len(pending)
+
+    def expire(self, store, limit):
+        self.compact(store, limit)
+
+    # rewrite stations.json and, if enough messages expired, the journal in the background
+    def compact(self, store, limit, wait=False):
+        if self.compaction is not None and self.compaction.is_alive():
+            return
+        self.commit()
+        stations = {band: dict(calls) for band, calls in store.station_data.items()} # stations are replaced, not modified
+        rewrite = self.lines > constants.JOURNAL_COMPACT_RATIO * len(store.message_data) + 1000
+        if rewrite: # expired lines are dropped
+            store.rollups.save(self.stations.rollups_filepath)
+        self.compaction = threading.Thread(name='Compaction', target=self._compact, args=(stations, limit if rewrite else None))
+        self.compaction.start()
+        if wait:
+            self.compaction.join()
+
+    def _compact(self, stations, limit):
+        self.stations.save_stations(stations)
+        if limit is None:
+            return
+        start = time.monotonic()
+        try:
+            with self.lock:
+                self.file.flush()
+                end = os.path.getsize(self.filepath) # lines appended after this are copied later
+            kept = 0
+            with open(self.filepath + '.tmp', 'wb') as tmp:
+                with open(self.filepath, 'rb') as file:
+                    position = 0
+                    for line in file:
+                        position += len(line)
+                        if position > end:
+                            break
+                        try:
+                            if json.loads(line)[0] < limit:
+                                continue
+                        except ValueError:
+                            continue
+                        tmp.write(line)
+                        kept += 1
+                with self.lock:
+                    self.file.flush()
+                    with open(self.filepath, 'rb') as file:
+                        file.seek(end)
+                        tail = file.readlines()
+                    tmp.writelines(tail)
+                    tmp.close()
+                    self.file.close()
+                    os.replace(self.filepath + '.tmp', self.filepath)
+                    self.file = open(self.filepath, 'a', encoding='utf-8')
+                    removed = self.lines - kept - len(tail)
+                    self.lines = kept + len(tail)
+            logger.info('compacted journal, removed %d messages in %.1f seconds' % (removed, time.monotonic() - start))
+        except Exception as e:
+            logger.error('could not compact journal!')
+            logger.error(e)
+
+    def clear(self):
+        self.pending.clear()
+        if self.compaction is not None:
+            self.compaction.join()
+        with self.lock:
+            self.file.close()
+            self.file = open(self.filepath, 'w', encoding='utf-8')
+            self.lines = 0
+
+    def save(self, store):
+        self.commit()
+        if self.compaction is not None:
+            self.compaction.join()
+        store.rollups.save(self.stations.rollups_filepath)
+        self.stations.save_stations(store.station_data)
+
+    def close(self):
+        self.commit()
+        if self.compaction is not None:
+            self.compaction.join()
+        with self.lock:
+            self.file.close()
+
+backends = {
+    'json': JsonBackend,
+    'sqlite': SQLiteBackend,
+    'journal': JournalBackend,
+}
@@ -0,0 +1,49 @@
+import math
+
+from . import constants
+
+# values at quantiles q (0..1) of a distribution given as (value, count) pairs (nearest rank)
+def weighted_quantiles(pairs, qs):
+    pairs = sorted(pairs)
+    total = sum(count for _, count in pairs)
+    if total == 0:
+        return [None for _ in qs]
+    result = []
+    for q in qs:
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for value, count in pairs:
+            seen += count
+            if seen >= rank:
+                result.append(value)
+                break
+    return result
+
+# distribution of reports, one bucket per dB from SNR_MIN to SNR_MAX (reports outside are clamped)
+# buckets are only allocated once used, histograms merge by adding counts
+class Histogram():
+    __slots__ = ('counts',)
+
+    def __init__(self, counts=None):
+        self.counts = {} if counts is None else {int(value): count for value, count in counts.items()} # dB -> number of messages
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def add(self, value, count=1):
+        value = max(constants.SNR_MIN, min(constants.SNR_MAX, int(value)))
+        self.counts[value] = self.counts.get(value, 0) + count
+
+    def update(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def quantiles(self, qs):
+        return weighted_quantiles(self.counts.items(), qs)
+
+    def to_json(self):
+        return self.counts
+
+    @staticmethod
+    def from_json(o):
+        return Histogram(o)
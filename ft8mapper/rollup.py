@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import logging
+
+from . import hll
+from . import quantiles
+from . import constants
+
+logger = logging.getLogger('rollup')
+
+HOUR = 3600
+
+# aggregate of all messages of an hour, band and grid
+# the distance to the receiver follows from the grid, so it is not stored
+class Bucket():
+    __slots__ = ('count', 'snr_min', 'snr_max', 'snr_sum', 'calls', 'snrs')
+
+    def __init__(self, count=0, snr_min=None, snr_max=None, snr_sum=0, calls=None, snrs=None):
+        self.count = count
+        self.snr_min = snr_min
+        self.snr_max = snr_max
+        self.snr_sum = snr_sum
+        self.calls = calls if calls is not None else hll.Distinct() # unique callsigns
+        self.snrs = snrs if snrs is not None else quantiles.Histogram() # distribution of reports
+
+    def add(self, call, snr):
+        self.count += 1
+        self.snr_sum += snr
+        if self.snr_min is None or snr < self.snr_min:
+            self.snr_min = snr
+        if self.snr_max is None or snr > self.snr_max:
+            self.snr_max = snr
+        self.calls.add(call)
+        self.snrs.add(snr)
+
+# long-term history: messages are rolled up into hourly buckets per band and grid when they expire
+# from the raw history (see Store.remove_old_data), buckets older than ROLLUP_MAX_AGE days are dropped
+# self.until: messages before this time (seconds since epoch) have been rolled up, so none is counted twice
+# the storage backend persists the rollups before it deletes the messages they were rolled up from
+class Rollups():
+    def __init__(self):
+        self.hours = {} # start of hour -> (band, grid) -> Bucket
+        self.until = None
+        self.modified = False
+        self.changed = set() # hours rolled up since take_changed()
+
+    def __len__(self):
+        return sum(len(buckets) for buckets in self.hours.values())
+
+    def clear(self):
+        self.hours.clear()
+        self.until = None
+        self.modified = True
+        self.changed.clear()
+
+    # add rows (see MessageHistory.append) older than until, rows rolled up before are skipped
+    def roll(self, rows, until):
+        count = 0
+        for t, call, grid, band, snr, *_ in rows:
+            if t >= until or (self.until is not None and t < self.until):
+                continue
+            hour = int(t // HOUR * HOUR)
+            buckets = self.hours.setdefault(hour, {})
+            bucket = buckets.get((band, grid))
+            if bucket is None:
+                bucket = Bucket()
+                buckets[(band, grid)] = bucket
+            bucket.add(call, snr)
+            self.changed.add(hour)
+            count += 1
+        if self.until is None or until > self.until:
+            self.until = until
+        self.modified = True
+        return count
+
+    def expire(self, limit):
+        for hour in [hour for hour in self.hours if hour + HOUR <= limit]:
+            del self.hours[hour]
+            self.changed.discard(hour)
+            self.modified = True
+
+    # (start of hour, band, grid, Bucket) of a time range, optionally of a single band, oldest first
+    def select(self, since=None, until=None, band=None):
+        hours = sorted(hour for hour in self.hours if (since is None or hour + HOUR > since) and (until is None or hour < until))
+        return [(hour, b, grid, bucket) for hour in hours for (b, grid), bucket in self.hours[hour].items() if band is None or b == band]
+
+    # hours rolled up since the last call, e.g. to update them in a database
+    def take_changed(self):
+        changed = sorted(hour for hour in self.changed if hour in self.hours)
+        self.changed = set()
+        return changed
+
+    # buckets as rows [hour, band, grid, count, snr_min, snr_max, snr_sum, calls, snrs] of some hours (all by default)
+    # calls and snrs as json values, see hll.Distinct and quantiles.Histogram
+    def rows(self, hours=None):
+        hours = sorted(self.hours) if hours is None else hours
+        return [
+            [hour, band, grid, bucket.count, bucket.snr_min, bucket.snr_max, bucket.snr_sum, bucket.calls.to_json(), bucket.snrs.to_json()]
+            for hour in hours for (band, grid), bucket in self.hours[hour].items()
+            ]
+
+    # add rows (see rows()) younger than ROLLUP_MAX_AGE
+    def add_rows(self, rows):
+        limit = time.time() - constants.ROLLUP_MAX_AGE * 86400
+        for hour, band, grid, count, snr_min, snr_max, snr_sum, calls, snrs in rows:
+            if hour + HOUR > limit:
+                self.hours.setdefault(hour, {})[(band, grid)] = Bucket(count, snr_min, snr_max, snr_sum, hll.Distinct.from_json(calls), quantiles.Histogram.from_json(snrs))
+
+    def load(self, filepath):
+        if not os.path.isfile(filepath):
+            return
+        logger.info('loading rollups')
+        try:
+            with open(filepath, 'r') as file:
+                data = json.load(file)
+            self.until = data['until']
+            self.add_rows(data['buckets'])
+            self.modified = False
+            logger.info('loaded %d rollups of %d hours from file' % (len(self), len(self.hours)))
+        except Exception as e:
+            logger.error('could not load rollups file!')
+            logger.error(e)
+
+    # written to a temporary file first, so a crash leaves the previous file intact
+    def save(self, filepath):
+        if not self.modified:
+            return
+        logger.info('saving rollups')
+        try:
+            with open(filepath + '.tmp', 'w') as file:
+                json.dump({'until': self.until, 'buckets': self.rows()}, file)
+            os.replace(filepath + '.tmp', filepath)
+            self.modified = False
+        except Exception as e:
+            logger.error('could not save rollups file!')
+            logger.error(e)
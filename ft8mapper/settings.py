@@ -28,15 +28,29 @@ class Settings(TKinterModernThemes.ThemedTKinterFrame):
         group_network.pack(side='top', anchor='n', ipady=4)
         host = ttk.Label(group_network, text='Host:', anchor='w', justify='left')
         port = ttk.Label(group_network, text='Port:', anchor='w', justify='left')
+        multicast = ttk.Label(group_network, text='Multicast:', anchor='w', justify='left')
+        interface = ttk.Label(group_network, text='Interface:', anchor='w', justify='left')
         host.grid(row=0, column=0, sticky='we', padx=4, pady=4)
         port.grid(row=1, column=0, sticky='we', padx=4, pady=4)
+        multicast.grid(row=2, column=0, sticky='we', padx=4, pady=4)
+        interface.grid(row=3, column=0, sticky='we', padx=4, pady=4)
 
         self.taddr = ttk.Entry(group_network)
         self.tport = ttk.Entry(group_network)
+        self.tmulticast = ttk.Entry(group_network)
+        self.tinterface = ttk.Entry(group_network)
         self.taddr.grid(row=0, column=1, columnspan=2, sticky='we', padx=4, pady=4)
         self.tport.grid(row=1, column=1, columnspan=2, sticky='we', padx=4, pady=4)
+        self.tmulticast.grid(row=2, column=1, columnspan=2, sticky='we', padx=4, pady=4)
+        self.tinterface.grid(row=3, column=1, columnspan=2, sticky='we', padx=4, pady=4)
         self.taddr.insert(0, self.config['network']['host'])
         self.tport.insert(0, self.config['network']['port'])
+        self.tmulticast.insert(0, self.config['network'].get('multicast', ''))
+        self.tinterface.insert(0, self.config['network'].get('interface', ''))
+
+        self.reuse = tk.BooleanVar(value=self.config['network'].get('reuse', False)) # share port with other applications
+        reuse = ttk.Checkbutton(group_network, text='share port', variable=self.reuse)
+        reuse.grid(row=4, column=1, columnspan=2, sticky='w', padx=4, pady=4)
 
         group_lookup = ttk.LabelFrame(self.master, text='Lookup')
         group_lookup.pack(side='top', anchor='n', ipady=4)
@@ -66,6 +80,9 @@ class Settings(TKinterModernThemes.ThemedTKinterFrame):
                 tk.Label(self.master, text='Port is not an integer!', fg='red'). \
                     grid(row=3, column=1, sticky=tk.W)
                 raise
+            self.config['network']['multicast'] = self.tmulticast.get().strip()
+            self.config['network']['interface'] = self.tinterface.get().strip()
+            self.config['network']['reuse'] = self.reuse.get()
             self.config['lookup'] = self.lookup_idx.get()
 
             c = int(self.config['network']['port'])
@@ -82,6 +99,16 @@ class Settings(TKinterModernThemes.ThemedTKinterFrame):
                 tk.Label(self.master, text='Not a valid IP address!',fg='red'). \
                     grid(row=3, column=1, sticky=tk.W)
                 raise
+            try:
+                if self.config['network']['multicast'] != '':
+                    if not ipaddress.ip_address(self.config['network']['multicast']).is_multicast:
+                        raise Exception('not a multicast address')
+                if self.config['network']['interface'] != '':
+                    ipaddress.ip_address(self.config['network']['interface'])
+            except:
+                tk.Label(self.master, text='Not a valid multicast group or interface!',fg='red'). \
+                    grid(row=3, column=1, sticky=tk.W)
+                raise
 
             if self.on_settings_changed is not None:
                 self.on_settings_changed()
@@ -0,0 +1,297 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from . import history
+from . import rollup
+from . import timebins
+from . import windowstats
+from . import gridcache
+from . import persistence
+from . import _station
+from . import constants
+
+logger = logging.getLogger('store')
+
+# station and message data, independent of any user interface
+# persist: read and write data of the storage backend, disabled e.g. for example stations
+class Store():
+    def __init__(self, config, persist=True):
+        self.config = config
+        self.persist = persist
+        self.station_data = {str(band): {} for _, _ , band, _ in constants.band_list} # last message per band and call
+        self.grid_index = {} # grid -> set of (band, call) in station_data
+        self.grids = gridcache.GridCache(self._filepath('grids.json')) # last known grid per call, on any band
+        self.unlocated = 0 # number of messages dropped because the grid of the caller was unknown
+        self.message_data = history.MessageHistory() # all stored messages (timestamp, call, grid, snr/report)
+        self.rollups = rollup.Rollups() # hourly aggregates of expired messages, persisted by the backend
+        self.plot_bins = timebins.PlotBins() # messages and rollups binned for the plot
+        self.stat_windows = windowstats.StatWindows() # statistics of the messages in the age limit
+        self.loaded_since = None # messages before this time are only in the backend
+        self.source_bands = {} # band per WSJT-X instance (client id)
+        self.last_remove_old_data = None
+        self.loader = None # thread reading the backend while loading, see start_loading()
+        self.chunks = None # loaded data not merged yet
+
+        storage = config.get('storage', 'json')
+        if storage not in persistence.backends:
+            raise Exception('unknown storage "%s"!' % storage)
+        if persist:
+            self.backend = persistence.backends[storage](config['configdir'])
+        else: # do not create or import any files
+            self.backend = persistence.NullBackend()
+
+    # path of a file in the config directory, None if nothing is persisted
+    def _filepath(self, filename):
+        return os.path.join(self.config['configdir'], filename) if self.persist else None
+
+    def clear(self):
+        self.poll_loading() # loaded messages would reappear otherwise
+        logger.debug('clearing data')
+        for band in self.station_data:
+            self.station_data[band].clear()
+        self.grid_index.clear()
+        self.message_data.clear()
+        self.rollups.clear()
+        self.plot_bins.clear()
+        self.stat_windows.clear()
+
+    # clear data in the backend, too
+    def clear_persisted(self):
+        if self.persist:
+            self.backend.clear()
+
+    # time span of messages needed by the user interface, older ones are only available as rollups
+    def active_window(self):
+        window = self.config.get('window', {})
+        return min(max(window.get('agelimit', constants.MAX_MESSAGE_AGE), window.get('plot', {}).get('x', 0)), constants.MAX_MESSAGE_AGE)
+
+    def load(self):
+        self.start_loading()
+        self.poll_loading()
+
+    # persisted data is read in a thread and merged in chunks by poll_loading(),
+    # so the user interface is usable while the history fills in
+    def start_loading(self):
+        since = None
+        if self.backend.partial:
+            since = time.time() - self.active_window()
+        self.grids.load()
+        self.message_data.clear()
+        self.chunks = queue.Queue(maxsize=constants.LOAD_QUEUE_SIZE) # limits memory if merging lags behind
+        self.loader = threading.Thread(name='Loader', target=self._read, args=(since, self.chunks), daemon=True)
+        self.loader.start()
+
+    def _read(self, since, chunks):
+        try:
+            chunks.put(('rollups', self.backend.read_rollups()))
+            chunks.put(('stations', self.backend.read_stations()))
+            chunk = []
+            for row in self.backend.read_messages(since):
+                chunk.append(row)
+                if len(chunk) >= constants.LOAD_CHUNK_SIZE:
+                    chunks.put(('messages', chunk))
+                    chunk = []
+            chunks.put(('messages', chunk))
+        except Exception as e:
+            logger.error('could not load messages!')
+            logger.error(e)
+        chunks.put(('done', since))
+
+    def loading(self):
+        return self.loader is not None
+
+    # fraction of the messages loaded, 0..1
+    def load_progress(self):
+        return self.backend.progress
+
+    # merge loaded chunks for at most budget seconds, or until loading is finished if budget is None
+    # returns True if loading has finished
+    def poll_loading(self, budget=None):
+        deadline = time.monotonic() + budget if budget is not None else None
+        while self.loader is not None:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            try:
+                kind, data = self.chunks.get(block=deadline is None)
+            except queue.Empty:
+                break
+            if kind == 'rollups':
+                self.rollups = data
+                self.plot_bins.clear()
+            elif kind == 'stations':
+                self.set_stations(data)
+            elif kind == 'messages':
+                self._merge(data)
+                self.plot_bins.clear()
+                self.stat_windows.clear()
+            else:
+                self.loader.join()
+                self.loader = None
+                self.chunks = None
+                self.loaded_since = data
+                logger.info('loaded %d messages' % len(self.message_data))
+                return True
+        return False
+
+    # append loaded messages, stations are updated by messages newer than them
+    def _merge(self, rows):
+        for row in rows:
+            self.message_data.append(*row)
+            band = str(row[3])
+            calls = self.station_data.setdefault(band, {})
+            previous = calls.get(row[1])
+            if previous is None or previous.time < row[0]:
+                if previous is not None:
+                    self._unindex_station(band, previous)
+                station = _station.Station(*row)
+                calls[station.call] = station
+                self._index_station(band, station)
+
+    # make sure messages since this time (seconds since epoch) are loaded, e.g. after changing the age filter
+    def ensure_loaded(self, since):
+        if self.loaded_since is None or since >= self.loaded_since:
+            return
+        older = list(self.backend.read_messages(since, self.loaded_since))
+        logger.info('loaded %d older messages' % len(older))
+        if len(older) > 0:
+            newer = self.message_data
+            self.message_data = history.MessageHistory()
+            for row in older:
+                self.message_data.append(*row)
+            for row in newer.rows():
+                self.message_data.append(*row)
+            self.plot_bins.clear()
+            self.stat_windows.clear()
+        self.loaded_since = since
+
+    # end of a batch of messages, called after dispatching events
+    def commit(self):
+        if self.persist:
+            self.backend.commit()
+
+    def save(self):
+        self.poll_loading() # never overwrite the history with a part of it
+        if self.persist:
+            self.backend.save(self)
+            self.grids.save()
+        if self.unlocated > 0:
+            logger.info('%d messages were dropped, grid of caller unknown' % self.unlocated)
+
+    def close(self):
+        self.poll_loading()
+        self.backend.close()
+
+    # replace all stations, e.g. when loading
+    def set_stations(self, station_data):
+        self.station_data = station_data
+        self.grid_index.clear()
+        for band in self.station_data:
+            for station in self.station_data[band].values():
+                self._index_station(band, station)
+
+    # time bins of the plot for a time span, see timebins.PlotBins
+    def time_bins(self, span):
+        return self.plot_bins.get(span, self.message_data, self.rollups)
+
+    # statistics of the last span seconds in a band, see windowstats.StatWindows
+    def window_stats(self, span, band, rx_grid=None):
+        return self.stat_windows.get(self.message_data, span, band, rx_grid)
+
+    # number of stations and grids heard in the last span seconds in a band
+    # long spans are estimated by merging the sketches of the plot bins, see hll.Distinct
+    def heard(self, span, band, rx_grid=None):
+        if span <= constants.DISTINCT_EXACT_SPAN:
+            window = self.window_stats(span, band, rx_grid)
+            return len(window.calls), len(window.grids)
+        now = time.time()
+        return self.plot_bins.get(span, self.message_data, self.rollups, now).distinct(now, now - span, band)
+
+    def remove_old_data(self):
+        now = time.time()
+        if self.last_remove_old_data is not None and now - self.last_remove_old_data < constants.CLEAN_PERIOD * 60:
+            return # limit frequency of cleanup
+
+        threshold = constants.MAX_MESSAGE_AGE
+        removed_stations = 0
+        for band in self.station_data: # iterate all bands
+            for call in list(self.station_data[band].keys()): # iterate all heard stations
+                if now - self.station_data[band][call].time > threshold:
+                    self._unindex_station(band, self.station_data[band].pop(call)) # remove old station
+                    removed_stations += 1
+        limit = now - threshold
+        if self.persist and self.backend.partial: # not all messages are loaded
+            self.backend.commit()
+            expired = self.backend.read_messages(self.rollups.until, limit)
+        else:
+            expired = self.message_data.rows(0, self.message_data.bisect(limit))
+        rolled = self.rollups.roll(expired, limit)
+        self.rollups.expire(now - constants.ROLLUP_MAX_AGE * 86400)
+        self.stat_windows.expire(self.message_data, now) # windows read expired messages from the history
+        removed_messages = self.message_data.remove_older_than(limit)
+        if self.persist:
+            self.backend.expire(self, limit) # persists the rollups before deleting messages
+        self.last_remove_old_data = now
+        logger.info('removed %d stations and %d messages that were older than %s, rolled up %d messages.' % (removed_stations, removed_messages, str(constants.MAX_MESSAGE_AGE), rolled))
+
+    def _index_station(self, band, station):
+        self.grid_index.setdefault(station.grid, set()).add((band, station.call))
+
+    def _unindex_station(self, band, station):
+        calls = self.grid_index.get(station.grid)
+        if calls is not None:
+            calls.discard((band, station.call))
+            if len(calls) == 0:
+                del self.grid_index[station.grid]
+
+    # last messages of all stations in a grid, one per band and call
+    def stations_in_grid(self, grid):
+        return [self.station_data[band][call] for band, call in self.grid_index.get(grid, ())]
+
+    # returns the band of the source or None if the frequency is out of band
+    def set_band(self, freq, source):
+        for band_lower, band_upper, band, _ in constants.band_list:              # step thru bandlist using freq
+            if  band_lower <= freq < band_upper:    # in this band?
+                self.source_bands[source] = int(band)
+                return int(band)
+
+        logger.warning('out of band frequency %d Hz detected.' % freq)
+        return None
+
+    # returns the new station or None if the message was not stored
+    def add_message(self, caller, grid, snr, msg, tval, source):
+        band = self.source_bands.get(source, constants.any_band) # each instance reports its own band
+        if band == constants.any_band:
+            return None # band not known yet
+        if grid == '': # no grid in this message
+            grid = self.grids.lookup(caller) # heard before, on any band
+            if grid is None:
+                self.unlocated += 1
+                return None # cannot be mapped
+        else:
+            self.grids.observe(caller, grid, tval)
+
+        logger.debug('adding station %s in %s (snr=%s, msg="%s") heard in %d m band by "%s"' % (caller, grid, snr, msg, band, source))
+        station = _station.Station(
+            tval,
+            caller,
+            grid,
+            band,
+            snr,
+            msg,
+            source
+            )
+
+        previous = self.station_data[str(band)].get(caller)
+        if previous is not None:
+            self._unindex_station(str(band), previous)
+        self.station_data[str(band)][caller] = station
+        self._index_station(str(band), station)
+        self.message_data.append(tval, caller, grid, band, snr, msg, source)
+        self.plot_bins.add(tval, caller, grid, band, int(snr))
+        self.stat_windows.add(tval, caller, grid, band)
+        if self.persist:
+            self.backend.add(station)
+        return station
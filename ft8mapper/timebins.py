@@ -0,0 +1,254 @@
+import time
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # bins are filled message by message
+
+from . import hll
+from . import rollup
+from . import maidenhead
+from . import quantiles
+from . import constants
+
+logger = logging.getLogger('timebins')
+
+# aggregate of the messages of a time bin in a band
+class Cell():
+    __slots__ = ('count', 'snr_sum', 'snr_min', 'snr_max', 'snrs', 'calls', 'grids')
+
+    def __init__(self, exact=False):
+        self.count = 0
+        self.snr_sum = 0
+        self.snr_min = None
+        self.snr_max = None
+        self.snrs = quantiles.Histogram()
+        self.calls = hll.Distinct(exact=exact)
+        self.grids = {} # grid -> number of messages, distances follow from the grids (see distances())
+
+    def add(self, call, grid, snr):
+        self.count += 1
+        self.snr_sum += snr
+        if self.snr_min is None or snr < self.snr_min:
+            self.snr_min = snr
+        if self.snr_max is None or snr > self.snr_max:
+            self.snr_max = snr
+        self.snrs.add(snr)
+        self.calls.add(call)
+        self.grids[grid] = self.grids.get(grid, 0) + 1
+
+    # add an hourly rollup (see rollup.Bucket) of a grid
+    def add_bucket(self, grid, bucket):
+        self.count += bucket.count
+        self.snr_sum += bucket.snr_sum
+        if self.snr_min is None or bucket.snr_min < self.snr_min:
+            self.snr_min = bucket.snr_min
+        if self.snr_max is None or bucket.snr_max > self.snr_max:
+            self.snr_max = bucket.snr_max
+        self.snrs.update(bucket.snrs)
+        self.calls.update(bucket.calls)
+        self.grids[grid] = self.grids.get(grid, 0) + bucket.count
+
+    # distribution of the distance as (km, number of messages), distance(grid) returns km
+    def distances(self, distance):
+        return [(distance(grid), count) for grid, count in self.grids.items()]
+
+# bins of one resolution, aligned to multiples of the resolution (seconds since epoch)
+# every bin holds a Cell per band and one for all bands (constants.any_band),
+# time advancing only moves the current bin, bins older than span are dropped
+# exact: count callsigns exactly instead of by sketches, see hll.Distinct
+class TimeBins():
+    def __init__(self, resolution, span, exact=False):
+        self.resolution = resolution
+        self.span = span
+        self.exact = exact
+        self.bins = {} # int(t // resolution) -> band -> Cell
+
+    def _cells(self, t, band):
+        cells = self.bins.get(int(t // self.resolution))
+        if cells is None:
+            cells = {}
+            self.bins[int(t // self.resolution)] = cells
+        cell = cells.get(band)
+        if cell is None:
+            cell = Cell(self.exact)
+            cells[band] = cell
+        total = cells.get(constants.any_band)
+        if total is None:
+            total = Cell(self.exact)
+            cells[constants.any_band] = total
+        return cell, total
+
+    def add(self, t, call, grid, band, snr):
+        for cell in self._cells(t, band):
+            cell.add(call, grid, snr)
+
+    # add the messages of the history since a point in time (seconds since epoch) to empty bins
+    # vectorized with numpy if available, the result is the same
+    def add_history(self, history, since, vectorized=True):
+        if vectorized and numpy is not None:
+            self._add_history_numpy(history, history.head + history.bisect(since))
+            return
+        for t, call, grid, band, snr, *_ in history.rows(history.bisect(since)):
+            self.add(t, call, grid, band, snr)
+
+    # groups rows by cell, i.e. (bin, band) and (bin, any band), and aggregates each group over the sorted rows
+    def _add_history_numpy(self, history, start):
+        if start >= len(history.time):
+            return
+        def column(values, dtype):
+            return numpy.frombuffer(values, dtype=values.typecode)[start:].astype(dtype) # copy, so the array can grow again
+        t = column(history.time, numpy.float64)
+        bands = column(history.band, numpy.int64)
+        snrs = column(history.snr, numpy.int64)
+        calls = column(history.call, numpy.int64)
+        grids = column(history.grid, numpy.int64)
+        keys = numpy.floor_divide(t, self.resolution).astype(numpy.int64)
+        buckets = constants.SNR_MAX - constants.SNR_MIN + 1
+        for cell_bands in (bands, numpy.full_like(bands, constants.any_band)):
+            groups = keys * 256 + cell_bands # bands are < 256
+            order = numpy.argsort(groups, kind='stable')
+            sorted_groups = groups[order]
+            starts = numpy.flatnonzero(numpy.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+            unique = sorted_groups[starts]
+            index = numpy.repeat(numpy.arange(len(unique)), numpy.diff(numpy.r_[starts, len(order)]))
+            group_snrs = snrs[order]
+            counts = numpy.diff(numpy.r_[starts, len(order)])
+            snr_sums = numpy.add.reduceat(group_snrs, starts)
+            snr_mins = numpy.minimum.reduceat(group_snrs, starts)
+            snr_maxs = numpy.maximum.reduceat(group_snrs, starts)
+            histograms = numpy.bincount(
+                index * buckets + (numpy.clip(group_snrs, constants.SNR_MIN, constants.SNR_MAX) - constants.SNR_MIN),
+                minlength=len(unique) * buckets
+                ).reshape(len(unique), buckets)
+            cells = []
+            for i, group in enumerate(unique.tolist()):
+                cell = Cell(self.exact)
+                cell.count = int(counts[i])
+                cell.snr_sum = int(snr_sums[i])
+                cell.snr_min = int(snr_mins[i])
+                cell.snr_max = int(snr_maxs[i])
+                for value in numpy.flatnonzero(histograms[i]).tolist():
+                    cell.snrs.counts[value + constants.SNR_MIN] = int(histograms[i, value])
+                self.bins.setdefault(group // 256, {})[group % 256] = cell
+                cells.append(cell)
+            # distinct callsigns and messages per grid by unique (group, id) pairs
+            pairs = numpy.unique(index * (1 << 32) + calls[order])
+            owners = pairs >> 32
+            sketched = numpy.zeros(len(unique), dtype=bool)
+            if not self.exact: # cells beyond the sparse limit get their sketch filled at once
+                sketched = numpy.bincount(owners, minlength=len(unique)) > constants.HLL_SPARSE_LIMIT
+            for pair in pairs[~sketched[owners]].tolist():
+                cells[pair >> 32].calls.add(history.calls[pair & 0xFFFFFFFF])
+            if sketched.any():
+                pairs = pairs[sketched[owners]]
+                ids, inverse = numpy.unique(pairs & 0xFFFFFFFF, return_inverse=True)
+                positions = numpy.array([hll.position(history.calls[id]) for id in ids.tolist()]).reshape(-1, 2)[inverse]
+                rows = numpy.cumsum(sketched) - 1 # cell -> row of the sketched cells
+                registers = numpy.zeros((int(sketched.sum()), 1 << constants.HLL_PRECISION), dtype=numpy.uint8)
+                numpy.maximum.at(registers, (rows[pairs >> 32], positions[:, 0]), positions[:, 1])
+                for i in numpy.flatnonzero(sketched).tolist():
+                    cells[i].calls = hll.Distinct.from_registers(registers[rows[i]].tobytes())
+            pairs, pair_counts = numpy.unique(index * (1 << 32) + grids[order], return_counts=True)
+            for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+                cells[pair >> 32].grids[history.grids[pair & 0xFFFFFFFF]] = count
+
+    def add_bucket(self, hour, grid, band, bucket):
+        for cell in self._cells(hour + rollup.HOUR / 2, band):
+            cell.add_bucket(grid, bucket)
+
+    def expire(self, now):
+        limit = int((now - self.span) // self.resolution)
+        for key in [key for key in self.bins if key < limit]:
+            del self.bins[key]
+
+    # cells of the last n bins of a band, the current bin first, None for bins without messages
+    def read(self, now, n, band=constants.any_band):
+        current = int(now // self.resolution)
+        return [self.bins.get(current - b, {}).get(band) for b in range(n)]
+
+    # number of callsigns and grids of a band since a point in time (seconds since epoch)
+    # the oldest bin is counted as a whole
+    def distinct(self, now, since, band=constants.any_band):
+        calls = hll.Distinct(exact=self.exact)
+        grids = set()
+        for cell in self.read(now, int(now // self.resolution) - int(since // self.resolution) + 1, band):
+            if cell is not None:
+                calls.update(cell.calls)
+                grids.update(cell.grids)
+        return len(calls), len(grids)
+
+# time bins behind the plot, one TimeBins per resolution of constants.plot_resolutions
+# built from the history and rollups on first use, then updated with every message
+class PlotBins():
+    def __init__(self):
+        self.tiers = {} # resolution -> TimeBins
+
+    # drop all bins, e.g. after the history was changed as a whole, they are rebuilt on next use
+    def clear(self):
+        self.tiers.clear()
+
+    def add(self, t, call, grid, band, snr):
+        for tier in self.tiers.values():
+            tier.add(t, call, grid, band, snr)
+
+    # bins for a time span of the plot (key of constants.plot_resolutions)
+    def get(self, span, history, rollups, now=None):
+        now = time.time() if now is None else now
+        resolution = constants.plot_resolutions[span][0]
+        tier = self.tiers.get(resolution)
+        if tier is None:
+            start = time.monotonic()
+            span = max(s for s, r in constants.plot_resolutions.items() if r[0] == resolution)
+            tier = TimeBins(resolution, span + resolution, span <= constants.DISTINCT_EXACT_SPAN)
+            since = now - tier.span
+            tier.add_history(history, since) # first, creates the cells of the raw messages
+            for hour, band, grid, bucket in rollups.select(since=since):
+                tier.add_bucket(hour, grid, band, bucket)
+            self.tiers[resolution] = tier
+            logger.debug('built %d bins of %d seconds in %.3f seconds' % (len(tier.bins), resolution, time.monotonic() - start))
+        tier.expire(now)
+        return tier
+
+# values of a plot metric (see constants.plot_metrics) for the cells of TimeBins.read()
+# returns (minima, means, maxima), P10/P50/P90 for percentile metrics, the same list three times
+# for metrics without a spread, default for bins without messages or an unknown receiver location
+def plot_values(cells, metric, resolution, rx_grid=None, default=0.0):
+    distances = {} # grid -> km to (current!) receiver location
+    def distance(grid):
+        if grid not in distances:
+            distances[grid] = maidenhead.locator_distance(rx_grid, grid) / 1000.0
+        return distances[grid]
+
+    if metric in ('M', 'S', 'G'):
+        value = {
+            'M': lambda cell: cell.count * 60 / resolution, # messages per minute
+            'S': lambda cell: float(len(cell.calls)),
+            'G': lambda cell: float(len(cell.grids))
+            }[metric]
+        y = [value(cell) if cell is not None else default for cell in cells]
+        return y, y, y
+
+    y_min = [default] * len(cells)
+    y_mean = [default] * len(cells)
+    y_max = [default] * len(cells)
+    for b, cell in enumerate(cells):
+        if cell is None:
+            continue
+        if metric == 'R':
+            y_min[b], y_mean[b], y_max[b] = cell.snr_min, cell.snr_sum / cell.count, cell.snr_max
+        elif metric == 'D' and rx_grid is not None:
+            pairs = cell.distances(distance) # (km, number of messages)
+            y_min[b] = min(km for km, _ in pairs)
+            y_mean[b] = sum(km * count for km, count in pairs) / cell.count
+            y_max[b] = max(km for km, _ in pairs)
+        elif metric in ('P', 'Q'):
+            values = [None] # receiver location unknown
+            if metric == 'P':
+                values = cell.snrs.quantiles(constants.plot_percentiles)
+            elif rx_grid is not None:
+                values = quantiles.weighted_quantiles(cell.distances(distance), constants.plot_percentiles)
+            if values[0] is not None:
+                y_min[b], y_mean[b], y_max[b] = values
+    return y_min, y_mean, y_max
@@ -0,0 +1,176 @@
+import logging
+from collections import namedtuple, OrderedDict, Counter
+
+from . import constants
+
+logger = logging.getLogger('tokenizer')
+
+# message kinds
+CQ = 'CQ'           # CQ [tag] call [grid]
+GRID = 'grid'       # call call grid
+REPORT = 'report'   # call call [R]+-nn
+SIGNOFF = 'signoff' # call call RRR/RR73/73
+CALLS = 'calls'     # call call
+TEXT = 'text'       # anything else, e.g. free text
+
+# token classes
+T_WORD = 0     # letters only, e.g. DX, POTA, TNX
+T_CALL = 1     # letters and digits, optionally with / or enclosed in <>
+T_GRID = 2     # maidenhead locator, 4 or 6 characters
+T_REPORT = 3   # signal report, optionally with R prefix
+T_SIGNOFF = 4  # RRR, RR73, 73
+T_CQ = 5
+T_NUMBER = 6   # digits only, e.g. CQ 290 (calling frequency)
+T_OTHER = 7
+T_HASH = 8     # <...>, callsign only known by its hash
+
+# reject reasons
+R_EMPTY = 'empty'
+R_TEXT = 'free text'
+R_CALLER = 'no caller'
+R_HASHED = 'hashed caller'
+R_GRID = 'no grid'
+
+Message = namedtuple('Message', ['kind', 'caller', 'called', 'grid', 'report', 'ota', 'text'])
+
+# tokens with a fixed meaning, checked before the shape of a token
+_words = {
+    'CQ': T_CQ,
+    'RRR': T_SIGNOFF,
+    'RR73': T_SIGNOFF, # looks like a grid, but is none
+    '73': T_SIGNOFF,
+    '<...>': T_HASH,
+}
+
+# character classes: A letter, 9 digit, punctuation is kept, anything else is ?
+_shape_table = {c: '?' for c in range(128)}
+for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
+    _shape_table[ord(c)] = 'A'
+for c in '0123456789':
+    _shape_table[ord(c)] = '9'
+for c in '/<>+-.':
+    _shape_table[ord(c)] = c
+
+# token classes by shape, shapes not listed here are classified by their characters
+_shapes = {
+    'AA99': T_GRID,
+    'AA99AA': T_GRID,
+    '+99': T_REPORT,
+    '-99': T_REPORT,
+    'A+99': T_REPORT, # R+nn, checked below
+    'A-99': T_REPORT,
+}
+
+_grid_field = frozenset('ABCDEFGHIJKLMNOPQR')
+
+def classify_token(token):
+    cls = _words.get(token)
+    if cls is not None:
+        return cls
+    if not token.isascii():
+        return T_OTHER
+    shape = token.translate(_shape_table)
+    cls = _shapes.get(shape)
+    if cls == T_GRID:
+        if token[0] in _grid_field and token[1] in _grid_field:
+            return T_GRID
+    elif cls == T_REPORT:
+        if len(token) == 3 or token[0] == 'R':
+            return T_REPORT
+    if '?' in shape or '.' in shape or '+' in shape or '-' in shape:
+        return T_OTHER
+    if '9' in shape:
+        if 'A' in shape:
+            return T_CALL if len(token) >= 3 else T_OTHER
+        return T_NUMBER if shape.isdigit() else T_OTHER
+    if 'A' in shape and shape.isalpha():
+        return T_WORD
+    return T_OTHER
+
+_calls = (T_CALL, T_HASH)
+
+def _call(token, cls):
+    return token.strip('<>') if cls == T_CALL else ''
+
+# single pass over the tokens of a message
+# returns (Message, reject reason), the reason is None if the message names a caller and its grid
+def classify(text):
+    tokens = text.split()
+    n = len(tokens)
+    if n == 0:
+        return Message(TEXT, '', '', '', None, '', text), R_EMPTY
+    classes = [classify_token(token) for token in tokens]
+
+    kind = TEXT
+    caller = called = grid = ota = ''
+    report = None
+    if classes[0] == T_CQ:                   # CQ [tag] caller [grid]
+        kind = CQ
+        i = 1
+        if n > 2 and classes[1] in (T_WORD, T_NUMBER): # DX, POTA, NA, 290, ...
+            ota = tokens[1]
+            i = 2
+        if i < n and classes[i] in _calls:
+            caller = _call(tokens[i], classes[i])
+            if i + 1 < n and classes[i + 1] == T_GRID:
+                grid = tokens[i + 1][:4]
+    elif n >= 2 and classes[1] in _calls:    # [called] caller [grid/report/73]
+        if classes[0] in _calls:
+            called = _call(tokens[0], classes[0])
+        caller = _call(tokens[1], classes[1])
+        kind = CALLS
+        if n > 2:
+            cls = classes[2]
+            if cls == T_GRID:
+                kind = GRID
+                grid = tokens[2][:4]
+            elif cls == T_REPORT:
+                kind = REPORT
+                report = int(tokens[2].lstrip('R'))
+            elif cls == T_SIGNOFF:
+                kind = SIGNOFF
+            else:
+                kind = TEXT
+
+    message = Message(kind, caller, called, grid, report, ota, text)
+    if kind == TEXT:
+        return message, R_TEXT
+    if len(caller) < 3:
+        return message, R_HASHED if caller == '' and '<...>' in tokens else R_CALLER
+    if grid == '':
+        return message, R_GRID
+    return message, None
+
+# classifies messages through a bounded cache, most messages are repeated every cycle (e.g. CQ)
+# rejected messages are counted by reason
+class Tokenizer():
+    def __init__(self, cache_size=constants.PARSE_CACHE_SIZE):
+        self.cache = OrderedDict() # message text -> (Message, reject reason), least recently used first
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.rejects = Counter()
+
+    # returns (Message, reject reason), see classify()
+    def parse(self, text):
+        result = self.cache.get(text)
+        if result is not None:
+            self.cache.move_to_end(text)
+            self.hits += 1
+        else:
+            result = classify(text)
+            self.cache[text] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self.misses += 1
+        if result[1] is not None:
+            self.rejects[result[1]] += 1
+        return result
+
+    def log_statistics(self):
+        total = self.hits + self.misses
+        logger.info('parsed %d messages, %.0f%% from cache, incomplete: %s' % (
+            total,
+            100.0 * self.hits / max(total, 1),
+            ', '.join('%d %s' % (count, reason) for reason, count in self.rejects.most_common()) or 'none'
+            ))
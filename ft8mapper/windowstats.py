@@ -0,0 +1,176 @@
+import time
+import logging
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # windows are built message by message
+
+from . import constants
+from . import maidenhead
+
+logger = logging.getLogger('windowstats')
+
+# statistics of the messages of the last span seconds in a band (or any band) for the statistics panel
+# updated on every message and on expiry, so reading them takes constant time:
+#   calls, grids: number of messages per callsign and grid, removed at zero
+#   ranges: (time, km, grid) with decreasing distance, the first one is the maximum range,
+#           a message farther away makes all older ones irrelevant (monotonic deque)
+# expired messages are read back from the history, which keeps them at least as long as any window
+# calls and grids are only kept for windows up to DISTINCT_EXACT_SPAN, see Store.heard() for longer ones
+# messages arriving out of order by a few seconds may expire a little late
+class WindowStats():
+    def __init__(self, span, band, rx_grid=None):
+        self.span = span
+        self.band = band
+        self.rx_grid = rx_grid # ranges are only kept if the receiver location is known
+        self.distances = {} # grid -> km
+        self.count = 0
+        self.distinct = span <= constants.DISTINCT_EXACT_SPAN
+        self.calls = {}
+        self.grids = {}
+        self.ranges = deque()
+        self.since = None # messages older than this are not in the window
+        self.first = None # time of the oldest message in the window, None if unknown
+        self.last = None  # time of the newest message
+
+    def _matches(self, band):
+        return self.band == constants.any_band or band == self.band
+
+    def add(self, t, call, grid, band):
+        if not self._matches(band) or (self.since is not None and t < self.since):
+            return
+        self.count += 1
+        if self.distinct:
+            self.calls[call] = self.calls.get(call, 0) + 1
+            self.grids[grid] = self.grids.get(grid, 0) + 1
+        if self.first is None or t < self.first:
+            self.first = t
+        if self.last is None or t > self.last:
+            self.last = t
+        if self.rx_grid is not None:
+            km = self._distance(grid)
+            while len(self.ranges) > 0 and self.ranges[-1][1] <= km:
+                self.ranges.pop()
+            self.ranges.append((t, km, grid))
+
+    def _distance(self, grid):
+        km = self.distances.get(grid)
+        if km is None:
+            km = maidenhead.locator_distance(self.rx_grid, grid) / 1000.0
+            self.distances[grid] = km
+        return km
+
+    def _remove(self, call, grid):
+        self.count -= 1
+        if not self.distinct:
+            return
+        for counts, key in ((self.calls, call), (self.grids, grid)):
+            n = counts[key] - 1
+            if n == 0:
+                del counts[key]
+            else:
+                counts[key] = n
+
+    # remove messages that left the window, must be called before the history drops them
+    def expire(self, history, now):
+        limit = now - self.span
+        if self.since is None or limit <= self.since:
+            return
+        for t, call, grid, band, *_ in history.rows(history.bisect(self.since), history.bisect(limit)):
+            if self._matches(band):
+                self._remove(call, grid)
+                self.first = None
+        self.since = limit
+        while len(self.ranges) > 0 and self.ranges[0][0] < limit:
+            self.ranges.popleft()
+        if self.count == 0:
+            self.first = self.last = None
+
+    # fill from the history, only done once per window
+    # vectorized with numpy if available, the result is the same
+    def build(self, history, now, vectorized=True):
+        self.since = now - self.span
+        if vectorized and numpy is not None:
+            self._build_numpy(history, history.head + history.bisect(self.since))
+            return
+        for t, call, grid, band, *_ in history.rows(history.bisect(self.since)):
+            self.add(t, call, grid, band)
+
+    def _build_numpy(self, history, start):
+        t = numpy.frombuffer(history.time, dtype=numpy.float64)[start:].copy() # copies, so the arrays can grow again
+        bands = numpy.frombuffer(history.band, dtype=numpy.uint8)[start:].copy()
+        calls = numpy.frombuffer(history.call, dtype=history.call.typecode)[start:].copy()
+        grids = numpy.frombuffer(history.grid, dtype=history.grid.typecode)[start:].copy()
+        if self.band != constants.any_band:
+            mask = bands == self.band
+            t, calls, grids = t[mask], calls[mask], grids[mask]
+        if len(t) == 0:
+            return
+        self.count = len(t)
+        self.first = float(t.min())
+        self.last = float(t.max())
+        if self.distinct:
+            ids, counts = numpy.unique(calls, return_counts=True)
+            self.calls = {history.calls[id]: count for id, count in zip(ids.tolist(), counts.tolist())}
+            ids, counts = numpy.unique(grids, return_counts=True)
+            self.grids = {history.grids[id]: count for id, count in zip(ids.tolist(), counts.tolist())}
+        if self.rx_grid is not None:
+            ids, inverse = numpy.unique(grids, return_inverse=True)
+            km = numpy.array([self._distance(history.grids[id]) for id in ids.tolist()])[inverse]
+            farthest_later = numpy.r_[numpy.maximum.accumulate(km[::-1])[::-1][1:], -numpy.inf]
+            for i in numpy.flatnonzero(km > farthest_later).tolist(): # what the monotonic deque keeps
+                self.ranges.append((float(t[i]), float(km[i]), history.grids[int(grids[i])]))
+
+    # (km, grid) of the station farthest away, None if unknown
+    def max_range(self):
+        if len(self.ranges) == 0:
+            return None
+        _, km, grid = self.ranges[0]
+        return km, grid
+
+    # seconds between the oldest and the newest message
+    def timespan(self, history):
+        if self.count == 0:
+            return 0
+        if self.first is None: # oldest message expired, find the next one
+            for t, _, _, band, *_ in history.rows(history.bisect(self.since)):
+                if self._matches(band):
+                    self.first = t
+                    break
+        return self.last - self.first
+
+# windows of the statistics panel by (span, band), created on first use and kept up to date
+# afterwards, so switching back and forth between filters does not scan the history
+class StatWindows():
+    def __init__(self):
+        self.windows = {} # (span, band, receiver grid) -> WindowStats
+
+    # drop all windows, e.g. after the history was changed as a whole, they are rebuilt on next use
+    def clear(self):
+        self.windows.clear()
+
+    def add(self, t, call, grid, band):
+        for window in self.windows.values():
+            window.add(t, call, grid, band)
+
+    def expire(self, history, now=None):
+        now = time.time() if now is None else now
+        for window in self.windows.values():
+            window.expire(history, now)
+
+    def get(self, history, span, band, rx_grid=None, now=None):
+        now = time.time() if now is None else now
+        window = self.windows.get((span, band, rx_grid))
+        if window is None:
+            if rx_grid is not None: # windows of a previous receiver location are outdated
+                for key in [key for key in self.windows if key[2] is not None and key[2] != rx_grid]:
+                    del self.windows[key]
+            start = time.monotonic()
+            window = WindowStats(span, band, rx_grid)
+            window.build(history, now)
+            self.windows[(span, band, rx_grid)] = window
+            logger.debug('built statistics of %d seconds in band %d in %.3f seconds' % (span, band, time.monotonic() - start))
+        window.expire(history, now)
+        return window
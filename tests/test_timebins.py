@@ -0,0 +1,47 @@
+import unittest
+
+from ft8mapper import timebins
+from ft8mapper import maidenhead
+
+class PlotValuesTest(unittest.TestCase):
+    def setUp(self):
+        self.bins = timebins.TimeBins(60, 3600)
+        self.now = 1700000000
+        for b, grid in enumerate(['JO62', 'FN42', 'PM95']): # one bin per grid, current bin first
+            t = self.now - b * 60
+            self.bins.add(t, 'DL%dABC' % b, grid, 20, -10 + b)
+            self.bins.add(t, 'W%dXYZ' % b, 'JO31', 20, -5)
+
+    def cells(self):
+        return self.bins.read(self.now, 5)
+
+    def km(self, grid):
+        return maidenhead.locator_distance('JO62', grid) / 1000.0
+
+    def test_range_over_several_bins(self):
+        y_min, y_mean, y_max = timebins.plot_values(self.cells(), 'D', 60, 'JO62')
+        for b, grid in enumerate(['JO62', 'FN42', 'PM95']):
+            self.assertAlmostEqual(y_min[b], min(self.km(grid), self.km('JO31')))
+            self.assertAlmostEqual(y_mean[b], (self.km(grid) + self.km('JO31')) / 2)
+            self.assertAlmostEqual(y_max[b], max(self.km(grid), self.km('JO31')))
+        self.assertEqual(y_mean[3:], [0.0, 0.0]) # bins without messages
+
+    def test_range_percentiles_over_several_bins(self):
+        y_min, y_mean, y_max = timebins.plot_values(self.cells(), 'Q', 60, 'JO62')
+        for b, grid in enumerate(['JO62', 'FN42', 'PM95']):
+            self.assertEqual(y_min[b], min(self.km(grid), self.km('JO31')))
+            self.assertEqual(y_max[b], max(self.km(grid), self.km('JO31')))
+        self.assertEqual(y_max[3:], [0.0, 0.0])
+
+    def test_range_without_receiver(self):
+        for metric in ('D', 'Q'):
+            self.assertEqual(timebins.plot_values(self.cells(), metric, 60), ([0.0] * 5,) * 3)
+
+    def test_counts(self):
+        y_min, y_mean, y_max = timebins.plot_values(self.cells(), 'S', 60)
+        self.assertEqual(y_mean, [2.0, 2.0, 2.0, 0.0, 0.0])
+        self.assertIs(y_min, y_max)
+        self.assertEqual(timebins.plot_values(self.cells(), 'M', 60)[1][0], 2.0)
+
+if __name__ == '__main__':
+    unittest.main()